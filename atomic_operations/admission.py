@@ -0,0 +1,99 @@
+"""
+Admission control of concurrent atomic operations requests
+"""
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from time import monotonic
+from typing import Dict, List
+
+from atomic_operations.exceptions import AdmissionRejected
+
+
+logger = logging.getLogger("atomic_operations.admission")
+
+
+class NullAdmissionController:
+    """Controller which admits every request. Used if admission control is disabled."""
+
+    enabled = False
+
+    _context = nullcontext()
+
+    def admit(self, parsed_operations: List[Dict]):
+        return self._context
+
+
+NULL_ADMISSION_CONTROLLER = NullAdmissionController()
+
+
+class AdmissionController:
+    """
+    Limits the total cost of the atomic operations requests which are processed at the same time by this process.
+
+    The cost of a request is the sum of the weights of its operations. Weights are looked up by `"{op}:{type}"`, then by
+    `"{op}"` and default to `default_weight`. Requests which do not fit into `max_cost` wait in order of their arrival
+    for up to `timeout` seconds and are rejected with `503` and a `Retry-After` header of `retry_after` seconds
+    afterwards. A request which costs more than `max_cost` on its own is admitted if no other request is in flight.
+
+    One controller has to be shared by all requests, e.g. as class attribute of the view.
+    """
+
+    enabled = True
+
+    def __init__(self, max_cost: int, timeout: float = 0, retry_after: int = 1, weights: Dict[str, int] = None,
+                 default_weight: int = 1):
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.in_flight = 0
+        self._waiting = deque()
+        self._condition = threading.Condition()
+
+    def get_cost(self, parsed_operations: List[Dict]) -> int:
+        cost = 0
+        for operation in parsed_operations:
+            operation_code = next(iter(operation))
+            resource_type = operation[operation_code]["type"]
+            cost += self.weights.get(
+                f"{operation_code}:{resource_type}", self.weights.get(operation_code, self.default_weight))
+        return cost
+
+    def fits(self, cost: int) -> bool:
+        return self.in_flight == 0 or self.in_flight + cost <= self.max_cost
+
+    def acquire(self, cost: int):
+        """Wait until the cost fits into the limit and all earlier requests are admitted, or raise `AdmissionRejected`"""
+        deadline = monotonic() + self.timeout
+        ticket = object()
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while self._waiting[0] is not ticket or not self.fits(cost):
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        logger.warning("rejected request with cost %d, %d in flight", cost, self.in_flight)
+                        raise AdmissionRejected(self.retry_after)
+                    self._condition.wait(remaining)
+                self.in_flight += cost
+            finally:
+                self._waiting.remove(ticket)
+                # the next waiting request may fit as well
+                self._condition.notify_all()
+
+    def release(self, cost: int):
+        with self._condition:
+            self.in_flight -= cost
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, parsed_operations: List[Dict]):
+        cost = self.get_cost(parsed_operations)
+        self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release(cost)
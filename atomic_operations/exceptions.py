@@ -1,6 +1,19 @@
+from typing import Dict
+
 from django.utils.translation import gettext_lazy as _
 from rest_framework import status
-from rest_framework.exceptions import APIException, ParseError
+from rest_framework.exceptions import (
+    APIException,
+    ParseError,
+    PermissionDenied,
+    ValidationError,
+)
+from rest_framework.settings import api_settings
+from rest_framework_json_api.utils import (
+    format_field_name,
+    get_serializer_fields,
+    is_relationship_field,
+)
 
 from atomic_operations.consts import ATOMIC_OPERATIONS
 
@@ -11,6 +24,23 @@ class UnprocessableEntity(APIException):
     default_code = 'unprocessable_entity'
 
 
+class AdmissionRejected(APIException):
+    """The request is rejected by the admission controller. Clients should retry after `wait` seconds."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many operations are processed at the moment.')
+    default_code = 'service_unavailable'
+
+    def __init__(self, wait: int = None):
+        self.wait = wait
+        super().__init__([
+            {
+                "id": "service-unavailable",
+                "detail": self.default_detail,
+                "status": f"{self.status_code}"
+            }
+        ])
+
+
 class JsonApiParseError(ParseError):
 
     def __init__(self, id, detail, pointer, status=status.HTTP_400_BAD_REQUEST, code=None):
@@ -47,3 +77,62 @@ class InvalidPrimaryDataType(JsonApiParseError):
             detail=f"primary data object musst be an {data_type}",
             pointer=f"/{ATOMIC_OPERATIONS}/{idx}/data"
         )
+
+
+class OperationPermissionDenied(PermissionDenied):
+    """Permission denials of operations, pointing to every denied operation"""
+
+    def __init__(self, denials: Dict[int, str]):
+        super().__init__([
+            {
+                "id": "permission-denied",
+                "detail": detail,
+                "source": {
+                    "pointer": f"/{ATOMIC_OPERATIONS}/{idx}"
+                },
+                "status": f"{self.status_code}"
+            } for idx, detail in sorted(denials.items())
+        ])
+
+
+class OperationValidationError(ValidationError):
+    """Serializer errors of a single operation, pointing to the operation which caused them"""
+
+    def __init__(self, idx: int, serializer, relationship_update: bool = False):
+        pointer = f"/{ATOMIC_OPERATIONS}/{idx}/data"
+        fields = get_serializer_fields(serializer) or {}
+
+        errors = []
+        for field_name, field_errors in serializer.errors.items():
+            if field_name == api_settings.NON_FIELD_ERRORS_KEY or relationship_update:
+                field_pointer = pointer
+            else:
+                member = "relationships" if is_relationship_field(
+                    fields.get(field_name)) else "attributes"
+                field_pointer = f"{pointer}/{member}/{format_field_name(field_name)}"
+            errors.extend(self.flatten(field_errors, field_pointer))
+
+        super().__init__(errors)
+
+    def flatten(self, field_errors, pointer):
+        if isinstance(field_errors, dict):
+            return [error for key, value in field_errors.items() for error in self.flatten(value, f"{pointer}/{key}")]
+        elif isinstance(field_errors, list):
+            return [error for value in field_errors for error in self.flatten(value, pointer)]
+        return [{
+            "detail": field_errors,
+            "source": {
+                "pointer": pointer
+            },
+            "status": f"{self.status_code}",
+            "code": getattr(field_errors, "code", self.default_code)
+        }]
+
+
+class ManyToManyUpsert(JsonApiParseError):
+    def __init__(self, idx, field_name: str):
+        super().__init__(
+            id="many-to-many-upsert",
+            detail=f"many to many relationship `{field_name}` can not be upserted",
+            pointer=f"/{ATOMIC_OPERATIONS}/{idx}/data/relationships/{field_name}"
+        )
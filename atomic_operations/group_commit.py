@@ -0,0 +1,95 @@
+"""
+Group commit of concurrent atomic operations requests
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from contextvars import copy_context
+from time import monotonic
+from typing import List
+
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.db.transaction import atomic
+
+
+logger = logging.getLogger("atomic_operations.group_commit")
+
+
+class GroupCommitExecutor:
+    """
+    Performs the operations of concurrent requests in one shared transaction, so many tiny requests share the costs of
+    one commit.
+
+    The first request of a group opens a window of `window` seconds. All requests which arrive within the window, up to
+    `max_requests`, are performed one after another by a worker thread, each inside of its own savepoint. A failing
+    request only rolls back its own savepoint. The transaction is committed after the last request of the group and every
+    request receives its own response afterwards. If the commit fails, all requests of the group fail.
+
+    One executor has to be shared by all requests, e.g. as class attribute of the view.
+    """
+
+    def __init__(self, window: float = 0.002, max_requests: int = 100, using: str = DEFAULT_DB_ALIAS):
+        self.window = window
+        self.max_requests = max_requests
+        self.using = using
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args):
+        """Perform the function in the next group and return its result after the group is committed"""
+        future = Future()
+        self._queue.put((copy_context(), function, args, future))
+        self.start()
+        return future.result()
+
+    def start(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self.work, name="atomic-operations-group-commit", daemon=True)
+                self._worker.start()
+
+    def collect(self) -> List:
+        """Wait for the first request and collect the requests which arrive within the window"""
+        group = [self._queue.get()]
+        deadline = monotonic() + self.window
+        while len(group) < self.max_requests:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+
+    def work(self):
+        while True:
+            self.commit_group(self.collect())
+
+    def commit_group(self, group: List):
+        outcomes = []
+        try:
+            # the worker thread keeps its connection, like a request thread it needs to drop broken or expired ones
+            close_old_connections()
+            with atomic(using=self.using):
+                for context, function, args, future in group:
+                    try:
+                        with atomic(using=self.using):
+                            outcomes.append((future, context.run(function, *args), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            logger.exception("group of %d requests could not be committed", len(group))
+            for _, _, _, future in group:
+                future.set_exception(error)
+            return
+
+        logger.debug("committed %d requests in one transaction", len(group))
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,171 @@
+"""
+Background execution of atomic operations documents
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from time import monotonic
+from typing import Dict, List, Tuple
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import connections
+
+
+logger = logging.getLogger("atomic_operations.jobs")
+
+# resource type of the job resources
+JOB_RESOURCE_TYPE = "AtomicJob"
+
+
+class Job:
+    """One atomic operations document which is executed in the background"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self, operations: List[Dict], user_id=None):
+        self.id = uuid4().hex
+        self.status = self.PENDING
+        self.operations = operations
+        self.user_id = user_id
+        # status code and rendered content of the response of the finished document
+        self.status_code = None
+        self.content = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in [self.SUCCEEDED, self.FAILED]
+
+    def finish(self, status_code: int, content: bytes):
+        self.status = self.SUCCEEDED if status_code < 400 else self.FAILED
+        self.status_code = status_code
+        self.content = content
+        # the operations are not needed anymore
+        self.operations = None
+
+    def render(self, url: str) -> bytes:
+        """Render the job resource document which is returned while the job is not finished"""
+        return json.dumps({
+            "data": {
+                "type": JOB_RESOURCE_TYPE,
+                "id": self.id,
+                "attributes": {
+                    "status": self.status
+                },
+                "links": {
+                    "self": url
+                }
+            }
+        }).encode()
+
+
+class InMemoryJobStore:
+    """
+    Keeps the jobs in the memory of the process. Jobs can only be polled from the process which executes them, so this
+    store is meant for single process deployments, tests and local development.
+
+    Jobs expire `timeout` seconds after they were saved last. If more than `max_jobs` jobs are stored, the finished jobs
+    which were saved first are dropped. Unfinished jobs are only dropped when they expire.
+    """
+
+    def __init__(self, timeout: int = 60 * 60, max_jobs: int = 100):
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        # jobs and their expiry in order of their last save
+        self.jobs: "OrderedDict[str, Tuple[Job, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, job: Job):
+        with self._lock:
+            self.jobs[job.id] = (job, monotonic() + self.timeout)
+            self.jobs.move_to_end(job.id)
+            self.evict()
+
+    def evict(self):
+        now = monotonic()
+        for job_id, (job, expires) in list(self.jobs.items()):
+            if expires <= now:
+                del self.jobs[job_id]
+        for job_id, (job, _) in list(self.jobs.items()):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if job.finished:
+                del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            job, expires = self.jobs.get(job_id, (None, 0))
+            if job is not None and expires <= monotonic():
+                del self.jobs[job_id]
+                return None
+            return job
+
+
+class CacheJobStore:
+    """Keeps the jobs in a django cache, so they can be polled from every process which shares the cache"""
+
+    def __init__(self, cache_alias: str = "default", timeout: int = 24 * 60 * 60, key_prefix: str = "atomic-job"):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def get_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}:{job_id}"
+
+    def save(self, job: Job):
+        caches[self.cache_alias].set(self.get_key(job.id), job, self.timeout)
+
+    def get(self, job_id: str) -> Job:
+        return caches[self.cache_alias].get(self.get_key(job_id))
+
+
+DEFAULT_JOB_STORE = InMemoryJobStore()
+
+
+class ThreadJobExecutor:
+    """
+    Default executor of the jobs. Runs them in a pool of `max_workers` threads of the web process. Jobs which are not
+    finished are lost if the process stops.
+
+    Other executors need to provide the same interface: `submit(function, *args)`.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def run(self, function, *args):
+        try:
+            function(*args)
+        except Exception:
+            logger.exception("atomic operations job failed")
+        finally:
+            # every worker thread opens its own database connections
+            connections.close_all()
+
+    def submit(self, function, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="atomic-operations-job")
+        return self._executor.submit(copy_context().run, self.run, function, *args)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+class SynchronousJobExecutor:
+    """Runs the jobs before the response is returned. For tests and debugging."""
+
+    def submit(self, function, *args):
+        function(*args)
@@ -0,0 +1,137 @@
+"""
+Memory profiling of the phases of atomic operations requests
+"""
+import logging
+import threading
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+
+logger = logging.getLogger("atomic_operations.memory")
+
+MemoryUsage = namedtuple("MemoryUsage", ["phase", "peak", "retained", "top"])
+
+# `tracemalloc.reset_peak()` was added in python 3.9. Without it the peak of a phase can not be measured
+CAN_RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+# tracing is global to the process, so it is started by the first profiler and stopped by the last one
+_tracing_lock = threading.Lock()
+_tracing_profilers = 0
+_tracing_started = False
+
+
+class NullMemoryProfiler:
+    """Profiler which measures nothing. Used if memory profiling is disabled."""
+
+    enabled = False
+
+    _context = nullcontext()
+
+    def measure(self, phase: str):
+        return self._context
+
+
+NULL_MEMORY_PROFILER = NullMemoryProfiler()
+
+
+class MemoryProfiler:
+    """
+    Measures the peak and retained memory of the phases of one atomic operations request with `tracemalloc`.
+
+    The peak is the highest amount of memory allocated during the phase, the retained memory is the amount which is still
+    allocated at the end of the phase. The allocation sites of the retained memory are collected as well.
+    `tracemalloc` traces the whole process, so the results are only meaningful if one request is handled at a time.
+    Concurrent requests share the tracing, which is stopped after the last of them is finished. The peak is `None` on
+    python 3.8.
+    """
+
+    enabled = True
+
+    def __init__(self, top: int = 10, frames: int = 1):
+        self.top = top
+        self.frames = frames
+        self.usages: List[MemoryUsage] = []
+        self._started = False
+
+    def start(self):
+        global _tracing_profilers, _tracing_started
+        if self._started:
+            return
+        with _tracing_lock:
+            if _tracing_profilers == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                _tracing_started = True
+            _tracing_profilers += 1
+        self._started = True
+
+    def stop(self):
+        """Stop tracing, if it was started by the profilers and this is the last one which uses it"""
+        global _tracing_profilers, _tracing_started
+        if not self._started:
+            return
+        with _tracing_lock:
+            _tracing_profilers -= 1
+            if _tracing_profilers == 0 and _tracing_started:
+                tracemalloc.stop()
+                _tracing_started = False
+        self._started = False
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    @contextmanager
+    def measure(self, phase: str):
+        self.start()
+        before = self.take_snapshot()
+        if CAN_RESET_PEAK:
+            tracemalloc.reset_peak()
+        start_size, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            end_size, peak_size = tracemalloc.get_traced_memory()
+            after = self.take_snapshot()
+            self.usages.append(MemoryUsage(
+                phase,
+                peak_size - start_size if CAN_RESET_PEAK else None,
+                end_size - start_size,
+                [difference for difference in after.compare_to(before, "lineno") if difference.size_diff > 0][:self.top]
+            ))
+
+    def get_summary(self, operations: int) -> Dict:
+        """Return the peak and retained memory in bytes by phase, in total and per operation"""
+        return {
+            "operations": operations,
+            "phases": [
+                {
+                    "phase": usage.phase,
+                    "peak": usage.peak,
+                    "retained": usage.retained,
+                    "peak_per_operation": usage.peak // operations if operations and usage.peak is not None else None,
+                    "retained_per_operation": usage.retained // operations if operations else None,
+                    "top": [
+                        {
+                            "site": str(difference.traceback),
+                            "size": difference.size_diff,
+                            "count": difference.count_diff
+                        } for difference in usage.top
+                    ]
+                } for usage in self.usages
+            ]
+        }
+
+    def log(self, request, summary: Dict):
+        for phase in summary["phases"]:
+            logger.info(
+                "%s %s: phase=%s operations=%d peak=%s retained=%d peak_per_operation=%s",
+                request.method, request.path, phase["phase"], summary["operations"], phase["peak"], phase["retained"],
+                phase["peak_per_operation"]
+            )
+            for allocation in phase["top"]:
+                logger.debug(
+                    "%s %s: phase=%s site=%s size=%d count=%d",
+                    request.method, request.path, phase["phase"], allocation["site"], allocation["size"],
+                    allocation["count"]
+                )
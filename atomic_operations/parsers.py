@@ -1,7 +1,8 @@
 """
 Parsers
 """
-from typing import Dict
+from collections import namedtuple
+from typing import Dict, List
 
 from rest_framework_json_api import renderers
 from rest_framework_json_api.parsers import JSONParser
@@ -13,6 +14,20 @@ from atomic_operations.exceptions import (
     JsonApiParseError,
     MissingPrimaryData,
 )
+from atomic_operations.memory import NULL_MEMORY_PROFILER
+from atomic_operations.timing import NULL_TIMER
+
+
+# a resource identifier object which refers to a resource by `lid` and its pointer relative to the operation
+LidReference = namedtuple("LidReference", ["identifier", "pointer"])
+
+
+class ParsedOperations(list):
+    """List of the parsed operations which knows the locations of all lids by operation index"""
+
+    def __init__(self, operations=(), lid_references: Dict[int, List[LidReference]] = None):
+        super().__init__(operations)
+        self.lid_references = lid_references if lid_references is not None else {}
 
 
 class AtomicOperationParser(JSONParser):
@@ -195,15 +210,50 @@ class AtomicOperationParser(JSONParser):
         _parsed_data.update(self.parse_metadata(result))
         return _parsed_data
 
+    def parse_lid_references(self, operation: Dict, parsed_data: Dict) -> List[LidReference]:
+        """Return the locations of all lids of the operation: the primary data and the relationship linkage objects"""
+        lid_references = []
+        if parsed_data.get("lid"):
+            lid_references.append(LidReference(parsed_data, "ref/lid" if operation.get("ref") else "data/lid"))
+
+        if operation["op"] == "update" and operation.get("ref"):
+            linkages = [("data", operation["data"])]
+        else:
+            relationships = (operation.get("data") or {}).get("relationships") or {}
+            linkages = [
+                (f"data/relationships/{field_name}/data", relationship.get("data"))
+                for field_name, relationship in relationships.items() if isinstance(relationship, dict)
+            ]
+
+        for pointer, linkage in linkages:
+            if isinstance(linkage, dict) and linkage.get("lid"):
+                lid_references.append(LidReference(linkage, f"{pointer}/lid"))
+            elif isinstance(linkage, list):
+                lid_references.extend(
+                    LidReference(identifier, f"{pointer}/{position}/lid") for position, identifier in enumerate(linkage)
+                    if isinstance(identifier, dict) and identifier.get("lid")
+                )
+        return lid_references
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        memory_profiler = getattr((parser_context or {}).get("view"), "memory_profiler", NULL_MEMORY_PROFILER)
+        with memory_profiler.measure("parse"):
+            return super().parse(stream, media_type, parser_context)
+
     def parse_data(self, result, parser_context):
         """
         Formats the output of calling JSONParser to match the JSON:API specification
         and returns the result.
         """
+        timer = getattr((parser_context or {}).get("view"), "timer", NULL_TIMER)
+        with timer.measure("parse"):
+            return self.parse_operations(result)
+
+    def parse_operations(self, result):
         self.check_root(result)
 
         # Construct the return data
-        parsed_data = []
+        parsed_data = ParsedOperations()
         for idx, operation in enumerate(result[ATOMIC_OPERATIONS]):
 
             self.check_operation(idx, operation)
@@ -235,5 +285,8 @@ class AtomicOperationParser(JSONParser):
             parsed_data.append({
                 operation_code: _parsed_data
             })
+            lid_references = self.parse_lid_references(operation, _parsed_data)
+            if lid_references:
+                parsed_data.lid_references[idx] = lid_references
 
         return parsed_data
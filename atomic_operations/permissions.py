@@ -0,0 +1,36 @@
+"""
+Permissions
+"""
+from typing import Dict, Iterable
+
+from rest_framework.permissions import BasePermission
+
+
+class AtomicOperationPermission(BasePermission):
+    """
+    Base class for permissions which check all operations of an atomic operations document at once.
+
+    `get_denied_operations` is called once per group of operations with the same operation code and resource type.
+    This allows to check a whole group with one query instead of one query per operation:
+
+    .. code-block:: python
+
+        class TenantPermission(AtomicOperationPermission):
+
+            def get_denied_operations(self, request, view, operation_code, resource_type, operations):
+                if operation_code == "add":
+                    return []
+                ids = {str(obj["id"]): idx for idx, obj in operations.items() if "id" in obj}
+                permitted = Article.objects.filter(pk__in=ids.keys(), tenant=request.user.tenant).values_list("pk", flat=True)
+                return [idx for pk, idx in ids.items() if pk not in {str(pk) for pk in permitted}]
+    """
+
+    message = "You do not have permission to perform this operation."
+
+    def get_denied_operations(self, request, view, operation_code: str, resource_type: str, operations: Dict[int, Dict]) -> Iterable[int]:
+        """Return the indices of all denied operations
+
+        `operations` maps the index of every operation of the group to its parsed primary data. Resources which are
+        referenced by `lid` are not created at this time, so their primary data contains the `lid` instead of an `id`.
+        """
+        return []
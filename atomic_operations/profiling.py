@@ -0,0 +1,27 @@
+"""
+Profiling of single atomic operations requests
+"""
+import cProfile
+
+
+class CProfileProfiler:
+    """
+    Default profiler of the `AtomicOperationView`. Writes `cProfile` stats which can be inspected with `pstats` or tools
+    like `snakeviz`.
+
+    Other profilers need to provide the same interface: `start()`, `stop()`, `dump(path)` and the `file_extension`.
+    """
+
+    file_extension = "prof"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path: str):
+        self.profile.dump_stats(path)
@@ -0,0 +1,128 @@
+"""
+Query accounting of atomic operations requests
+"""
+import logging
+import re
+from collections import OrderedDict, defaultdict
+from contextlib import ExitStack, contextmanager, nullcontext
+from time import perf_counter
+from typing import Dict, List
+
+from django.db import connections
+
+
+logger = logging.getLogger("atomic_operations.queries")
+
+# collapses lists of placeholders like `IN (%s, %s, %s)` so queries with different list lengths are grouped together
+PLACEHOLDER_LIST = re.compile(r"\((?:%s|\?)(?:\s*,\s*(?:%s|\?))*\)")
+
+
+class NullQueryRecorder:
+    """Recorder which records nothing. Used if query accounting is disabled."""
+
+    enabled = False
+
+    _context = nullcontext()
+
+    def record(self):
+        return self._context
+
+    def operation(self, idx: int, operation_code: str, resource_type: str):
+        return self._context
+
+    def bulk(self, operation_code: str, resource_type: str, size: int):
+        return self._context
+
+
+NULL_QUERY_RECORDER = NullQueryRecorder()
+
+
+class QueryRecorder:
+    """Records the sql queries of one atomic operations request by operation index and bulk flush"""
+
+    enabled = True
+
+    def __init__(self, n_plus_one_threshold: int = 5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.queries = []
+        self.scopes = []
+        self._stack = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            scope = self._stack[-1] if self._stack else None
+            self.queries.append((scope, sql, perf_counter() - start))
+
+    def record(self):
+        """Install the recorder on all database connections while the context is active"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    @contextmanager
+    def scope(self, **scope):
+        self.scopes.append(scope)
+        self._stack.append(len(self.scopes) - 1)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+
+    def operation(self, idx: int, operation_code: str, resource_type: str):
+        return self.scope(kind="operation", index=idx, op=operation_code, type=resource_type)
+
+    def bulk(self, operation_code: str, resource_type: str, size: int):
+        return self.scope(kind="bulk", op=operation_code, type=resource_type, size=size)
+
+    def get_n_plus_one_queries(self) -> List[Dict]:
+        """Return all select queries which are issued by at least `n_plus_one_threshold` operations of the same type"""
+        operations_by_query = defaultdict(set)
+        for scope, sql, _ in self.queries:
+            if scope is None or self.scopes[scope]["kind"] != "operation" or not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            operation = self.scopes[scope]
+            operations_by_query[(operation["op"], operation["type"], PLACEHOLDER_LIST.sub("(%s)", sql))].add(scope)
+
+        return [
+            {"op": operation_code, "type": resource_type,
+                "operations": len(scopes), "sql": sql}
+            for (operation_code, resource_type, sql), scopes in operations_by_query.items()
+            if len(scopes) >= self.n_plus_one_threshold
+        ]
+
+    def get_summary(self) -> Dict:
+        counts = OrderedDict((idx, [0, 0]) for idx in range(len(self.scopes)))
+        total = [0, 0]
+        for scope, _, duration in self.queries:
+            total[0] += 1
+            total[1] += duration
+            if scope is not None:
+                counts[scope][0] += 1
+                counts[scope][1] += duration
+
+        summary = {
+            "total": {"count": total[0], "duration": round(total[1] * 1000, 3)},
+            "operations": [],
+            "bulk": [],
+            "n_plus_one": self.get_n_plus_one_queries()
+        }
+        for idx, (count, duration) in counts.items():
+            scope = dict(self.scopes[idx])
+            kind = scope.pop("kind")
+            scope.update(
+                {"count": count, "duration": round(duration * 1000, 3)})
+            summary["operations" if kind == "operation" else "bulk"].append(scope)
+        return summary
+
+    def log(self, request, summary: Dict):
+        logger.debug("%s %s: %d queries in %.3fms", request.method,
+                     request.path, summary["total"]["count"], summary["total"]["duration"])
+        for query in summary["n_plus_one"]:
+            logger.warning(
+                "%s %s: possible N+1 query issued by %d `%s` operations of type `%s`: %s",
+                request.method, request.path, query["operations"], query["op"], query["type"], query["sql"]
+            )
@@ -0,0 +1,34 @@
+"""
+Relations
+"""
+from typing import Dict
+
+from django.db.models import Model
+
+
+class PrefetchedQuerySet:
+    """
+    Stands in for the queryset of a relationship field while an atomic operations request is processed.
+
+    Lookups by primary key are answered from the instances which are prefetched for the whole document. All other
+    lookups and lookups of not prefetched primary keys are passed to the original queryset, so unknown ids are reported
+    by the relationship field as usual.
+    """
+
+    def __init__(self, queryset, instances: Dict[str, Model]):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.instances = instances
+
+    def get(self, *args, **kwargs):
+        if not args and kwargs.keys() == {"pk"}:
+            instance = self.instances.get(str(kwargs["pk"]))
+            if instance is not None:
+                return instance
+        return self.queryset.get(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self.queryset)
+
+    def __getattr__(self, name):
+        return getattr(self.queryset, name)
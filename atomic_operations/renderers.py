@@ -1,9 +1,15 @@
 """
 Renderers
 """
-import json
-from typing import List, OrderedDict
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, OrderedDict, Set
 
+import inflection
+from rest_framework import renderers
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.utils.serializer_helpers import ReturnDict
+from rest_framework.utils import json
+from rest_framework_json_api import utils
 from rest_framework_json_api.renderers import JSONRenderer
 from rest_framework_json_api.utils import get_resource_type_from_serializer
 
@@ -12,6 +18,16 @@ from atomic_operations.consts import (
     ATOMIC_MEDIA_TYPE,
     ATOMIC_RESULTS,
 )
+from atomic_operations.memory import NULL_MEMORY_PROFILER
+from atomic_operations.timing import NULL_TIMER
+
+
+class AtomicResult(ReturnDict):
+    """Serialized data of one result which is serialized together with other results by a `many=True` serializer"""
+
+    def __init__(self, *args, **kwargs):
+        self.instance = kwargs.pop("instance", None)
+        super().__init__(*args, **kwargs)
 
 
 class AtomicResultRenderer(JSONRenderer):
@@ -52,25 +68,150 @@ class AtomicResultRenderer(JSONRenderer):
         except Exception:
             pass
 
+    def is_error_response(self, data: List[OrderedDict], renderer_context) -> bool:
+        response = renderer_context.get("response")
+        if response is not None:
+            return response.status_code >= 400
+        # without response, only results which are not serialized can be errors
+        return any(
+            self.check_error(operation_result_data, None, renderer_context)
+            for operation_result_data in data if getattr(operation_result_data, "serializer", None) is None
+        )
+
     def render(self, data: List[OrderedDict], accepted_media_type=None, renderer_context=None):
         renderer_context = renderer_context or {"view": {}}
 
+        view = renderer_context["view"]
+        timer = getattr(view, "timer", NULL_TIMER)
+        memory_profiler = getattr(view, "memory_profiler", NULL_MEMORY_PROFILER)
+        try:
+            with timer.measure("render"), memory_profiler.measure("render"):
+                rendered_content = self.render_atomic_results(
+                    data, accepted_media_type, renderer_context)
+        finally:
+            if memory_profiler.enabled:
+                view.report_memory()
+        if timer.enabled:
+            view.report_timings(renderer_context.get("response"))
+        return rendered_content
+
+    def get_result_instance(self, operation_result_data: OrderedDict):
+        if isinstance(operation_result_data, AtomicResult):
+            return operation_result_data.instance
+        return operation_result_data.serializer.instance
+
+    def build_atomic_result(self, operation_result_data: OrderedDict) -> Dict:
+        """Build the result object of one operation from the serialized data"""
+        serializer = operation_result_data.serializer
+        instance = self.get_result_instance(operation_result_data)
+        atomic_result = {
+            "data": self.build_json_resource_obj(
+                utils.get_serializer_fields(serializer),
+                operation_result_data,
+                instance,
+                get_resource_type_from_serializer(serializer),
+                serializer,
+                getattr(serializer, "_poly_force_type_resolution", False)
+            )
+        }
+        meta = self.extract_root_meta(serializer, operation_result_data)
+        if meta:
+            atomic_result["meta"] = utils.format_field_names(meta)
+        return atomic_result
+
+    def get_included_resources(self, request, serializer) -> List[str]:
+        """Return the include paths of the request which are supported by the serializer of a result"""
+        included_serializers = getattr(serializer, "included_serializers", None)
+        if not included_serializers:
+            return []
+        return [
+            path for path in utils.get_included_resources(request, serializer)
+            if inflection.underscore(path.split(".")[0]) in included_serializers
+        ]
+
+    def extract_result_included(self, operation_result_data: OrderedDict, request, included_cache: Dict):
+        """Add the resources which are included by the result to the included cache"""
+        serializer = operation_result_data.serializer
+        included_resources = self.get_included_resources(request, serializer)
+        if included_resources:
+            self.extract_included(
+                utils.get_serializer_fields(serializer),
+                operation_result_data,
+                self.get_result_instance(operation_result_data),
+                included_resources,
+                included_cache
+            )
+
+    def build_included(self, included_cache: Dict, primary_resources: Set) -> List[Dict]:
+        """Return the included resources sorted by type and id, without the resources which are results themselves"""
+        return [
+            included_cache[resource_type][resource_id]
+            for resource_type in sorted(included_cache)
+            for resource_id in sorted(included_cache[resource_type])
+            if (resource_type, resource_id) not in primary_resources
+        ]
+
+    def render_atomic_results(self, data: List[OrderedDict], accepted_media_type=None, renderer_context=None):
+        if self.is_error_response(data, renderer_context):
+            # error responses are containing errors only. Render all of them.
+            return self.render_errors(data, accepted_media_type, renderer_context)
+
+        request = renderer_context.get("request")
+        included_cache = defaultdict(dict)
         atomic_results = []
         for operation_result_data in data:
-            has_error = self.check_error(
-                operation_result_data, accepted_media_type, renderer_context)
-            if has_error:
-                return has_error
+            atomic_results.append(self.build_atomic_result(operation_result_data))
+            self.extract_result_included(operation_result_data, request, included_cache)
+
+        document = {ATOMIC_RESULTS: atomic_results}
+        included = self.build_included(
+            included_cache, {(result["data"]["type"], result["data"]["id"]) for result in atomic_results})
+        if included:
+            document["included"] = included
 
-            # pass in the resource name
-            renderer_context["view"].resource_name = get_resource_type_from_serializer(
-                operation_result_data.serializer)
-            rendered_primary_data = super().render(
-                operation_result_data, accepted_media_type, renderer_context)
-            atomic_results.append(rendered_primary_data.decode("UTF-8"))
+        # top-level meta object provided by the view, e.g. debug information
+        meta = getattr(renderer_context["view"], "response_meta", None)
+        if meta:
+            document["meta"] = meta
 
-        atomic_results_str = f"[{','.join(atomic_results)}]"
+        # the whole document is encoded at once by the plain json renderer of rest framework
+        return renderers.JSONRenderer.render(self, document, accepted_media_type, renderer_context)
 
-        rendered_content = '{"' + ATOMIC_RESULTS + '":' + atomic_results_str + '}'
+    def encode(self, data) -> str:
+        """Encode the data the same way the json renderer of rest framework does, without indentation"""
+        return json.dumps(
+            data, cls=self.encoder_class, ensure_ascii=self.ensure_ascii, allow_nan=not self.strict,
+            separators=SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+        ).replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+    def render_stream(self, data: Iterable[OrderedDict], meta: Dict = None, chunk_size: int = 100,
+                      request=None) -> Iterator[bytes]:
+        """Render the atomic results document piece by piece, `chunk_size` results at a time
+
+        Included resources are collected while the results are rendered and sent after all of them.
+        """
+        yield ('{"' + ATOMIC_RESULTS + '":[').encode()
+
+        separator = ""
+        chunk = []
+        included_cache = defaultdict(dict)
+        primary_resources = set()
+        for operation_result_data in data:
+            atomic_result = self.build_atomic_result(operation_result_data)
+            primary_resources.add((atomic_result["data"]["type"], atomic_result["data"]["id"]))
+            self.extract_result_included(operation_result_data, request, included_cache)
+            chunk.append(self.encode(atomic_result))
+            if len(chunk) >= chunk_size:
+                yield (separator + ",".join(chunk)).encode()
+                separator = ","
+                chunk = []
+        if chunk:
+            yield (separator + ",".join(chunk)).encode()
 
-        return rendered_content.encode()
+        end = "]"
+        included = self.build_included(included_cache, primary_resources)
+        if included:
+            end += ',"included":' + self.encode(included)
+        if meta:
+            end += ',"meta":' + self.encode(meta)
+        yield (end + "}").encode()
@@ -0,0 +1,42 @@
+"""
+Database routers
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+
+
+database_aliases: ContextVar[Dict] = ContextVar(
+    "atomic_operations_database_aliases", default={})
+
+
+@contextmanager
+def route_models(model_aliases: Dict):
+    """Routes all queries of the given models to their database alias while the context is active"""
+    token = database_aliases.set(model_aliases)
+    try:
+        yield
+    finally:
+        database_aliases.reset(token)
+
+
+class AtomicOperationRouter:
+    """
+    Routes the models of the currently processed atomic operations request to the database aliases configured by the
+    `database_aliases` attribute of the `AtomicOperationView`.
+
+    This is needed if serializers are creating resources by themselves, for example by `serializer.save()` in the
+    sequential mode. Add it in front of your other routers:
+
+    .. code-block:: python
+
+        DATABASE_ROUTERS = ["atomic_operations.routers.AtomicOperationRouter"]
+
+    Outside of atomic operation requests the router has no opinion.
+    """
+
+    def db_for_read(self, model, **hints):
+        return database_aliases.get().get(model)
+
+    def db_for_write(self, model, **hints):
+        return database_aliases.get().get(model)
@@ -0,0 +1,84 @@
+"""
+Timing of the phases of atomic operations requests
+"""
+import logging
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import List
+
+
+Timing = namedtuple(
+    "Timing", ["phase", "operation_code", "resource_type", "duration"])
+
+
+class NullTimer:
+    """Timer which measures nothing. Used if timing is disabled, so the hooks cost close to nothing."""
+
+    enabled = False
+    timings: List[Timing] = []
+
+    _context = nullcontext()
+
+    def measure(self, phase: str, operation_code: str = None, resource_type: str = None):
+        return self._context
+
+
+NULL_TIMER = NullTimer()
+
+
+class PhaseTimer:
+    """Collects the durations of the phases of one atomic operations request"""
+
+    enabled = True
+
+    def __init__(self):
+        self.timings: List[Timing] = []
+
+    @contextmanager
+    def measure(self, phase: str, operation_code: str = None, resource_type: str = None):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append(
+                Timing(phase, operation_code, resource_type, perf_counter() - start))
+
+    def get_phase_durations(self) -> OrderedDict:
+        """Return the summarized durations in seconds by phase"""
+        durations = OrderedDict()
+        for timing in self.timings:
+            durations[timing.phase] = durations.get(
+                timing.phase, 0) + timing.duration
+        return durations
+
+    def get_server_timing(self) -> str:
+        """Return the value of the `Server-Timing` header with the durations in milliseconds by phase"""
+        return ", ".join(
+            f"{phase};dur={duration * 1000:.3f}" for phase, duration in self.get_phase_durations().items()
+        )
+
+
+class LoggingTimingSink:
+    """Writes the timings of a request to the given logger, one record per phase, operation code and resource type"""
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger("atomic_operations.timing")
+        self.level = level
+
+    def __call__(self, request, timings: List[Timing]):
+        if not self.logger.isEnabledFor(self.level):
+            return
+
+        durations = OrderedDict()
+        for timing in timings:
+            key = (timing.phase, timing.operation_code, timing.resource_type)
+            count, duration = durations.get(key, (0, 0))
+            durations[key] = (count + 1, duration + timing.duration)
+
+        for (phase, operation_code, resource_type), (count, duration) in durations.items():
+            self.logger.log(
+                self.level,
+                "%s %s: phase=%s operation=%s type=%s count=%d duration=%.3fms",
+                request.method, request.path, phase, operation_code, resource_type, count, duration * 1000
+            )
@@ -0,0 +1,77 @@
+"""
+Tracing of atomic operations requests.
+
+The view only uses `tracer.start_as_current_span(name, attributes=...)` and `span.set_attribute(key, value)`, so every
+OpenTelemetry tracer can be used, e.g. `opentelemetry.trace.get_tracer("atomic_operations")`.
+"""
+import threading
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Dict, List
+
+
+class NullSpan:
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class NullTracer:
+    """Tracer which traces nothing. Used if tracing is disabled."""
+
+    _context = nullcontext(NULL_SPAN)
+
+    def start_as_current_span(self, name: str, attributes: Dict = None):
+        return self._context
+
+
+NULL_TRACER = NullTracer()
+
+
+class Span:
+
+    def __init__(self, name: str, attributes: Dict = None, parent: "Span" = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.start_time = perf_counter()
+        self.end_time = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.end_time = perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return self.end_time - self.start_time
+
+    def __repr__(self):
+        return f"<Span {self.name} {self.attributes}>"
+
+
+class InMemoryTracer:
+    """Tracer which keeps all finished spans in memory, for tests and local debugging"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._local = threading.local()
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Dict = None):
+        stack = self._local.__dict__.setdefault("stack", [])
+        span = Span(name, attributes, stack[-1] if stack else None)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+            span.end()
+            self.spans.append(span)
+
+    def clear(self):
+        self.spans = []
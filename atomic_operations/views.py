@@ -1,16 +1,70 @@
-from typing import Dict, List
-from collections import defaultdict
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextvars import copy_context
+from typing import Dict, Iterator, List, Set
+from collections import defaultdict, deque
+from uuid import uuid4
 
-from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
-from django.db.transaction import atomic
+import inflection
+from django import VERSION as DJANGO_VERSION
+from django.conf import settings
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+    ObjectDoesNotExist,
+    ValidationError,
+)
+from django.db import connections, router
+from django.db.models import DO_NOTHING, Model, Q, signals
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.transaction import atomic, set_rollback
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.relations import ManyRelatedField, RelatedField
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.validators import (
+    BaseUniqueForValidator,
+    UniqueTogetherValidator,
+    UniqueValidator,
+)
 from rest_framework.views import APIView
+from rest_framework_json_api.relations import ResourceRelatedField
+from rest_framework_json_api.utils import (
+    format_field_name,
+    get_included_resources,
+    get_resource_type_from_serializer,
+)
 
-from atomic_operations.consts import ATOMIC_OPERATIONS
-from atomic_operations.exceptions import UnprocessableEntity
-from atomic_operations.parsers import AtomicOperationParser
-from atomic_operations.renderers import AtomicResultRenderer
+from atomic_operations.admission import NULL_ADMISSION_CONTROLLER
+from atomic_operations.consts import ATOMIC_CONTENT_TYPE, ATOMIC_OPERATIONS
+from atomic_operations.exceptions import (
+    ManyToManyUpsert,
+    OperationPermissionDenied,
+    OperationValidationError,
+    UnprocessableEntity,
+)
+from atomic_operations.jobs import DEFAULT_JOB_STORE, Job
+from atomic_operations.jobs import logger as job_logger
+from atomic_operations.memory import NULL_MEMORY_PROFILER, MemoryProfiler
+from atomic_operations.parsers import AtomicOperationParser, LidReference
+from atomic_operations.profiling import CProfileProfiler
+from atomic_operations.queries import NULL_QUERY_RECORDER, QueryRecorder
+from atomic_operations.relations import PrefetchedQuerySet
+from atomic_operations.renderers import AtomicResult, AtomicResultRenderer
+from atomic_operations.routers import AtomicOperationRouter, route_models
+from atomic_operations.timing import NULL_TIMER, PhaseTimer
+from atomic_operations.tracing import NULL_TRACER
+
+
+# request ids which are used as part of the profile file names
+SAFE_REQUEST_ID = re.compile(r"[\w-]{1,64}")
+
+# names of the tracing spans of bulk flushes by operation code
+BULK_SPAN_NAMES = {"add": "perform_bulk_create", "remove": "perform_bulk_delete"}
 
 
 class AtomicOperationView(APIView):
@@ -26,14 +80,104 @@ class AtomicOperationView(APIView):
     serializer_classes: Dict = {}
 
     sequential = True
+    # validate operations which do not depend on results of earlier operations before the transaction is opened
+    validate_before_transaction = False
+    # number of threads which validate the independent operations before the transaction. Writes stay sequential
+    validation_workers = None
+    # limits the total cost of the requests which are processed at the same time, e.g. `AdmissionController(max_cost=1000)`
+    admission_controller = NULL_ADMISSION_CONTROLLER
+    # executes documents in the background and responds with `202 Accepted` and the url of the job, e.g. `ThreadJobExecutor()`
+    job_executor = None
+    job_store = DEFAULT_JOB_STORE
+    # url name of the `AtomicJobView`, which receives the id of the job as `pk`
+    job_url_name = None
+    # documents with at least this many operations are always executed as job, others only with `Prefer: respond-async`
+    job_min_operations = None
+    # performs the operations of concurrent requests in one shared transaction, e.g. `GroupCommitExecutor(window=0.002)`
+    group_commit = None
+    # allows clients to request a dry run by the `dry_run_header` or the `dry_run_parameter`. Dry runs perform all
+    # operations in transactions which are rolled back and add the execution plan to the top-level meta
+    allow_dry_run = False
+    dry_run_header = "X-Atomic-Dry-Run"
+    dry_run_parameter = "dryRun"
+    dry_run = False
+    # maps resource types to database aliases. Unmapped resource types are routed by the django database routers
+    database_aliases: Dict = {}
+    # load all related resources which are referenced by id with one query per relationship field before validation
+    prefetch_relationships = True
+    related_instances: Dict = {}
+    # resource types whose `add` operations update the existing resource with the same values of the given unique model
+    # fields instead of failing, e.g. `{"articles": ["slug"]}`
+    upsert_fields: Dict[str, List[str]] = {}
+    # resource types which are removed by a filtered DELETE without loading the instances first. Only declare types whose
+    # models have no delete signals, no custom `delete()` and no relations which need to be cascaded by django
+    fast_remove_types: List[str] = []
+    # removes the resources of all other types by a filtered DELETE as well if their models allow it, see
+    # `is_fast_removable()`. The other types are deleted by the deletion collector of django
+    detect_fast_removes = False
+    fast_removable_models: Dict = {}
+    # maximum number of primary keys per DELETE statement of fast removes
+    fast_remove_chunk_size = 1000
+    # resource types whose `update` operations are applied by `filter(pk__in=...).update()` without loading the instances
+    # first. Equal changes of consecutive operations are applied by one UPDATE. Only declare types whose serializers have
+    # no custom `update()` or validation which needs the instance and whose models have no save signals
+    blind_update_types: List[str] = []
+    # maximum number of primary keys per UPDATE statement of blind updates
+    blind_update_chunk_size = 1000
+    # callable which receives the request and the timings of all phases, e.g. `LoggingTimingSink()`
+    timing_sink = None
+    # adds the durations by phase as `Server-Timing` header to the response
+    server_timing = False
+    timer = NULL_TIMER
+    # records the queries per operation and bulk flush and adds a summary to the top-level meta of the response
+    debug_queries = False
+    query_recorder = NULL_QUERY_RECORDER
+    # logs the peak and retained memory of the parse, execute and render phases to the `atomic_operations.memory` logger
+    profile_memory = False
+    memory_profiler = NULL_MEMORY_PROFILER
+    # opentelemetry compatible tracer which receives one span per request and child spans per operation or bulk flush
+    tracer = NULL_TRACER
+    # directory where the profiles of requests with the `profile_header` are written. Profiling is disabled if unset
+    profile_directory = None
+    profile_header = "X-Atomic-Profile"
+    profiler_class = CProfileProfiler
+    profiler = None
+    # return a streaming response which serializes and renders the results after the transaction is committed
+    stream_results = False
+    # number of results which are rendered and sent together by a streaming response
+    stream_chunk_size = 100
+    response_meta: Dict = {}
     response_data: List[Dict] = []
+    # positions of the results in `response_data` which are not serialized yet and their resources
+    pending_results: List[int] = []
+    pending_resources: Set = set()
 
-    lid_to_id = defaultdict(dict)
+    # maps the `lid` of added resources to their ids by resource type. Reset for every request
+    lid_to_id: Dict = {}
+    # the locations of the lids of the parsed operations by operation index
+    lid_references: Dict = {}
+    # union of the included serializers of all serializer classes which is used to validate the `include` parameter
+    included_serializers_class = None
 
-    # TODO: proof how to check permissions for all operations
-    # permission_classes = TODO
-    # call def check_permissions for `add` operation
-    # call def check_object_permissions for `update` and `remove` operation
+    @classmethod
+    def as_view(cls, **initkwargs):
+        cls.check_database_routing(initkwargs.get("database_aliases", cls.database_aliases))
+        cls.check_upsert_support(initkwargs.get("upsert_fields", cls.upsert_fields))
+        return super().as_view(**initkwargs)
+
+    @classmethod
+    def check_database_routing(cls, database_aliases: Dict):
+        """Serializers write to the database of the django routers, which needs to be the one of the transaction"""
+        if database_aliases and not any(isinstance(_router, AtomicOperationRouter) for _router in router.routers):
+            raise ImproperlyConfigured(
+                f"`{cls.__name__}` configures `database_aliases`, so you need to add "
+                "`atomic_operations.routers.AtomicOperationRouter` to the `DATABASE_ROUTERS` setting.")
+
+    @classmethod
+    def check_upsert_support(cls, upsert_fields: Dict):
+        """Upserts use the conflict handling of `bulk_create()`, which was added in django 4.1"""
+        if upsert_fields and DJANGO_VERSION < (4, 1):
+            raise ImproperlyConfigured(f"`{cls.__name__}` configures `upsert_fields`, which requires django 4.1 or later.")
 
     def get_serializer_classes(self) -> Dict:
         if self.serializer_classes:
@@ -42,7 +186,11 @@ class AtomicOperationView(APIView):
             raise ImproperlyConfigured("You need to define the serializer classes. "
                                        "Otherwise serialization of json:api primary data is not possible.")
 
-    def get_serializer_class(self, operation_code: str, resource_type: str):
+    def get_serializer_class(self, operation_code: str = None, resource_type: str = None):
+        if operation_code is None and resource_type is None:
+            # called without arguments by the include validation of the serializers of django rest framework json api
+            return self.get_included_serializers_class()
+
         serializer_class = self.get_serializer_classes().get(
             f"{operation_code}:{resource_type}")
         if serializer_class:
@@ -52,6 +200,21 @@ class AtomicOperationView(APIView):
             raise ImproperlyConfigured(
                 f"No serializer for type `{resource_type}` and operation `{operation_code}` where found")
 
+    def get_included_serializers_class(self):
+        """Return a class with the included serializers of all serializer classes
+
+        The `include` parameter applies to the results of all operations, so an include path is valid if the serializer
+        of any resource type supports it.
+        """
+        if self.included_serializers_class is None:
+            included_serializers = {}
+            for serializer_class in self.get_serializer_classes().values():
+                for field_name, included_serializer in (getattr(serializer_class, "included_serializers", None) or {}).items():
+                    included_serializers.setdefault(field_name, included_serializer)
+            self.included_serializers_class = type(
+                "AtomicIncludedSerializers", (), {"included_serializers": included_serializers or None})
+        return self.included_serializers_class
+
     def get_serializer(self, idx, operation_code, resource_type, *args, **kwargs):
         """
         Return the serializer instance that should be used for validating and
@@ -61,26 +224,55 @@ class AtomicOperationView(APIView):
             operation_code, resource_type)
         kwargs.setdefault('context', self.get_serializer_context())
 
-        if operation_code in ["update", "remove"]:
-            try:
-                kwargs.update({
-                    "instance": serializer_class.Meta.model.objects.get(pk=kwargs["data"]["id"])
-                })
-            except ObjectDoesNotExist:
-                raise UnprocessableEntity([
-                    {
-                        "id": "object-does-not-exist",
-                        "detail": f'Object with id `{kwargs["data"]["id"]}` received for operation with index `{idx}` does not exist',
-                        "source": {
-                            "pointer": f"/{ATOMIC_OPERATIONS}/{idx}/data/id"
-                        },
-                        "status": "422"
-                    }
-                ]
-                )
+        model = serializer_class.Meta.model
+        if (operation_code == "update" and resource_type not in self.blind_update_types) or \
+                (operation_code == "remove" and not self.can_fast_remove(resource_type, model)):
+            kwargs["instance"] = self.get_instance(idx, resource_type, model, kwargs["data"]["id"])
+        elif operation_code == "update":
+            # blind updates are validated against an unsaved instance, so unique validators exclude the updated row
+            kwargs["instance"] = model(pk=kwargs["data"]["id"])
 
         return serializer_class(*args, **kwargs)
 
+    def get_instance(self, idx: int, resource_type: str, model, pk):
+        try:
+            return model.objects.using(self.get_database_alias(resource_type, model)).get(pk=pk)
+        except ObjectDoesNotExist:
+            raise UnprocessableEntity([self.get_object_does_not_exist_error(idx, pk)])
+
+    def get_object_does_not_exist_error(self, idx: int, pk) -> Dict:
+        return {
+            "id": "object-does-not-exist",
+            "detail": f'Object with id `{pk}` received for operation with index `{idx}` does not exist',
+            "source": {
+                "pointer": f"/{ATOMIC_OPERATIONS}/{idx}/data/id"
+            },
+            "status": "422"
+        }
+
+    def get_database_alias(self, resource_type: str, model) -> str:
+        return self.database_aliases.get(resource_type) or router.db_for_write(model)
+
+    def get_model_database_aliases(self) -> Dict:
+        """Return the configured database alias by model class"""
+        model_aliases = {}
+        for key, serializer_class in self.get_serializer_classes().items():
+            resource_type = key.split(":", 1)[1]
+            if resource_type in self.database_aliases:
+                model_aliases[serializer_class.Meta.model] = self.database_aliases[resource_type]
+        return model_aliases
+
+    def get_used_database_aliases(self, parsed_operations: List[Dict]) -> List[str]:
+        """Return all database aliases which are touched by the given operations"""
+        aliases = set()
+        for operation in parsed_operations:
+            operation_code = next(iter(operation))
+            resource_type = operation[operation_code]["type"]
+            model = self.get_serializer_class(
+                "update" if operation_code == "update-relationship" else operation_code, resource_type).Meta.model
+            aliases.add(self.get_database_alias(resource_type, model))
+        return sorted(aliases)
+
     def get_serializer_context(self):
         """
         Extra context provided to the serializer class.
@@ -92,22 +284,424 @@ class AtomicOperationView(APIView):
 
         }
 
+    def check_operation_permissions(self, parsed_operations: List[Dict]):
+        """
+        Check the permissions of all operations grouped by operation code and resource type.
+        Raises an appropriate exception which points to every denied operation.
+        """
+        permissions = [permission for permission in self.get_permissions(
+        ) if hasattr(permission, "get_denied_operations")]
+        if not permissions:
+            return
+
+        groups = defaultdict(dict)
+        for idx, operation in enumerate(parsed_operations):
+            operation_code = next(iter(operation))
+            obj = operation[operation_code]
+            groups[(operation_code, obj["type"])][idx] = obj
+
+        denials = {}
+        for permission in permissions:
+            for (operation_code, resource_type), operations in groups.items():
+                for idx in permission.get_denied_operations(self.request, self, operation_code, resource_type, operations):
+                    denials.setdefault(idx, getattr(
+                        permission, "message", None) or OperationPermissionDenied.default_detail)
+
+        if denials:
+            raise OperationPermissionDenied(denials)
+
+    def get_operation_serializer(self, idx, operation_code, obj):
+        with self.timer.measure("lids", operation_code, obj["type"]):
+            self.substitute_lids(idx, operation_code, obj)
+
+        serializer = self.get_serializer(
+            idx=idx,
+            data=obj,
+            operation_code="update" if operation_code == "update-relationship" else operation_code,
+            resource_type=obj["type"],
+            partial=True if "update" in operation_code else False
+        )
+        if operation_code != "remove":
+            self.use_related_instances(serializer)
+        if operation_code == "add" and obj["type"] in self.upsert_fields:
+            self.remove_unique_validators(serializer, self.upsert_fields[obj["type"]])
+        return serializer
+
+    def remove_unique_validators(self, serializer, unique_fields: List[str]):
+        """Upserts may send values of the unique fields which exist already"""
+        for field_name in unique_fields:
+            field = serializer.fields.get(field_name)
+            if field is not None:
+                field.validators = [
+                    validator for validator in field.validators if not isinstance(validator, UniqueValidator)]
+        serializer.validators = [
+            validator for validator in serializer.validators
+            if not (isinstance(validator, UniqueTogetherValidator) and set(validator.fields) <= set(unique_fields))
+        ]
+
+    def get_relationship_fields(self, serializer) -> Dict:
+        """Return the writable resource related fields of the serializer by field name"""
+        relationship_fields = {}
+        for field_name, field in serializer.fields.items():
+            relation = field.child_relation if isinstance(
+                field, ManyRelatedField) else field
+            if isinstance(relation, ResourceRelatedField) and not relation.read_only:
+                relationship_fields[field_name] = relation
+        return relationship_fields
+
+    def prefetch_related_instances(self, parsed_operations: List[Dict]):
+        """Load all related resources which are referenced by id with one query per relationship field
+
+        Related resources of models which are removed by any operation of the document are not prefetched. Resources
+        which are referenced after an earlier operation updated their model are not prefetched either, they are loaded
+        when their operation is validated.
+        """
+        relationship_fields = {}
+        querysets = {}
+        referenced_ids = defaultdict(set)
+        stale_ids = defaultdict(set)
+        removed_models = set()
+        updated_models = set()
+
+        for operation in parsed_operations:
+            operation_code = next(iter(operation))
+            obj = operation[operation_code]
+            serializer_class = self.get_serializer_class(
+                "update" if operation_code == "update-relationship" else operation_code, obj["type"])
+            if operation_code == "remove":
+                removed_models.add(serializer_class.Meta.model)
+                continue
+
+            if serializer_class not in relationship_fields:
+                relationship_fields[serializer_class] = self.get_relationship_fields(
+                    serializer_class(context=self.get_serializer_context()))
+
+            for field_name, relation in relationship_fields[serializer_class].items():
+                value = obj.get(field_name)
+                for identifier in value if isinstance(value, list) else [value]:
+                    if isinstance(identifier, dict) and identifier.get("id") is not None and not identifier.get("lid"):
+                        querysets.setdefault(
+                            (serializer_class, field_name), relation.get_queryset())
+                        referenced_ids[(serializer_class, field_name)].add(
+                            identifier["id"])
+                        if querysets[(serializer_class, field_name)].model in updated_models:
+                            stale_ids[(serializer_class, field_name)].add(identifier["id"])
+
+            if operation_code != "add" or obj["type"] in self.upsert_fields:
+                updated_models.add(serializer_class.Meta.model)
+
+        for key, ids in referenced_ids.items():
+            queryset = querysets[key]
+            if queryset.model in removed_models:
+                continue
+            pks = []
+            for pk in ids - stale_ids[key]:
+                try:
+                    pks.append(queryset.model._meta.pk.to_python(pk))
+                except (TypeError, ValueError, ValidationError):
+                    # invalid ids are reported by the relationship field itself
+                    pass
+            self.related_instances[key] = {
+                str(instance.pk): instance for instance in queryset.filter(pk__in=pks)}
+
+    def use_related_instances(self, serializer):
+        """Pass the prefetched related resources to the relationship fields of the serializer"""
+        if not self.related_instances:
+            return
+        for field_name, relation in self.get_relationship_fields(serializer).items():
+            instances = self.related_instances.get(
+                (serializer.__class__, field_name))
+            if instances is not None:
+                relation.queryset = PrefetchedQuerySet(
+                    relation.get_queryset(), instances)
+
+    def validate_operation(self, idx, serializer, operation_code):
+        if operation_code == "remove":
+            return
+        with self.timer.measure("validate", operation_code, serializer.initial_data["type"]):
+            is_valid = serializer.is_valid()
+        if not is_valid:
+            raise OperationValidationError(
+                idx, serializer, relationship_update=operation_code == "update-relationship")
+
+    def get_resource_identifiers(self, obj: Dict) -> List[Dict]:
+        """Return all resource identifier objects the primary data of an operation refers to by relationships"""
+        identifiers = []
+        for key, value in obj.items():
+            if key in ["id", "lid", "type", "_meta"]:
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, dict) and "type" in item:
+                    identifiers.append(item)
+        return identifiers
+
+    def get_independent_operations(self, parsed_operations: List[Dict]) -> Set[int]:
+        """Return the indices of all operations which do not depend on results of earlier operations
+
+        An operation depends on earlier operations if it references a `lid`, if it targets a resource which is touched
+        by an earlier operation or if it refers to a resource type which is added or removed by an earlier operation.
+        Operations whose serializers have unique validators depend on every earlier write of their resource type, because
+        the validators read the state of the table. Removes can cascade to resources of any type, so all later operations
+        which target or refer to a resource depend on them.
+        """
+        independent_operations = set()
+        written_types = set()
+        changed_types = set()
+        touched_resources = set()
+        unique_validated = {}
+        removed = False
+        lid_references = self.get_lid_references(parsed_operations)
+
+        for idx, operation in enumerate(parsed_operations):
+            operation_code = next(iter(operation))
+            obj = operation[operation_code]
+            resource_type = obj["type"]
+            resource = (resource_type, str(obj.get("id")))
+
+            depends_on_lid = any(
+                operation_code != "add" or reference.identifier is not obj for reference in lid_references.get(idx, []))
+            depends_on_target = operation_code != "add" and (
+                resource_type in written_types or resource in touched_resources)
+            identifiers = self.get_resource_identifiers(obj)
+            depends_on_relation = any(identifier["type"] in written_types for identifier in identifiers)
+            depends_on_remove = removed and (operation_code != "add" or bool(identifiers))
+            depends_on_table = False
+            if operation_code != "remove" and resource_type in changed_types:
+                if (operation_code, resource_type) not in unique_validated:
+                    unique_validated[operation_code, resource_type] = self.has_unique_validators(
+                        operation_code, resource_type)
+                depends_on_table = unique_validated[operation_code, resource_type]
+            if not (depends_on_lid or depends_on_target or depends_on_relation or depends_on_table or depends_on_remove):
+                independent_operations.add(idx)
+
+            changed_types.add(resource_type)
+            removed = removed or operation_code == "remove"
+            if operation_code in ["add", "remove"]:
+                written_types.add(resource_type)
+            else:
+                touched_resources.add(resource)
+
+        return independent_operations
+
+    def has_unique_validators(self, operation_code: str, resource_type: str) -> bool:
+        """Return whether the serializer of the operation validates against other rows of its table"""
+        serializer = self.get_serializer_class(
+            "update" if operation_code == "update-relationship" else operation_code, resource_type)()
+        if operation_code == "add" and resource_type in self.upsert_fields:
+            self.remove_unique_validators(serializer, self.upsert_fields[resource_type])
+        unique_validators = (UniqueValidator, UniqueTogetherValidator, BaseUniqueForValidator)
+        return any(isinstance(validator, unique_validators) for validator in serializer.validators) or any(
+            isinstance(validator, unique_validators)
+            for field in serializer.fields.values() for validator in field.validators)
+
+    def prevalidate_operation(self, idx: int, operation: Dict):
+        operation_code = next(iter(operation))
+        serializer = self.get_operation_serializer(
+            idx, operation_code, operation[operation_code])
+        self.validate_operation(idx, serializer, operation_code)
+        return serializer
+
+    def prevalidate_operations(self, parsed_operations: List[Dict]) -> Dict:
+        """Validate all independent operations and return their serializers by operation index"""
+        indices = sorted(self.get_independent_operations(parsed_operations))
+        if self.validation_workers and len(indices) > 1:
+            return self.prevalidate_operations_in_parallel(parsed_operations, indices)
+        return {idx: self.prevalidate_operation(idx, parsed_operations[idx]) for idx in indices}
+
+    def prevalidate_operations_in_parallel(self, parsed_operations: List[Dict], indices: List[int]) -> Dict:
+        """Validate the independent operations by a pool of `validation_workers` threads
+
+        Every worker takes the next operation in order until all are validated. Operations after a failed operation are
+        skipped and the error of the lowest failing operation is raised, so the reported error does not depend on the
+        scheduling of the threads.
+        """
+        pending = deque(indices)
+        outcomes = {}
+        lowest_failure = len(parsed_operations)
+
+        def validate_pending():
+            nonlocal lowest_failure
+            while True:
+                try:
+                    idx = pending.popleft()
+                except IndexError:
+                    break
+                if idx > lowest_failure:
+                    break
+                try:
+                    outcomes[idx] = self.prevalidate_operation(idx, parsed_operations[idx])
+                except Exception as error:
+                    outcomes[idx] = error
+                    lowest_failure = min(lowest_failure, idx)
+
+        def validate():
+            try:
+                # the query recorder of the request is installed on the connections of the request thread only
+                with self.query_recorder.record():
+                    validate_pending()
+            finally:
+                # every worker thread opens its own database connections
+                connections.close_all()
+
+        workers = min(self.validation_workers, len(indices))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # the context is copied for every worker, so the database routing applies to their queries as well
+            futures = [executor.submit(copy_context().run, validate) for _ in range(workers)]
+        for future in futures:
+            future.result()
+
+        for idx in indices:
+            if isinstance(outcomes.get(idx), Exception):
+                raise outcomes[idx]
+        return outcomes
+
+    def should_dry_run(self, request) -> bool:
+        if not self.allow_dry_run:
+            return False
+        value = request.headers.get(self.dry_run_header) or request.query_params.get(self.dry_run_parameter)
+        return bool(value) and value.lower() not in ["0", "false"]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.dry_run = self.should_dry_run(request)
+        if self.dry_run:
+            # the results need to be serialized before the transaction is rolled back
+            self.stream_results = False
+        self.timer = PhaseTimer() if self.timing_sink or self.server_timing else NULL_TIMER
+        self.query_recorder = QueryRecorder() if self.debug_queries or self.dry_run else NULL_QUERY_RECORDER
+        self.memory_profiler = MemoryProfiler() if self.profile_memory else NULL_MEMORY_PROFILER
+
+    def report_timings(self, response=None):
+        """Pass the timings of the request to the timing sink and the `Server-Timing` header"""
+        if self.server_timing and response is not None:
+            response["Server-Timing"] = self.timer.get_server_timing()
+        if self.timing_sink:
+            self.timing_sink(self.request, self.timer.timings)
+
+    def report_memory(self):
+        """Log the memory usage of the request and stop tracing the memory allocations"""
+        try:
+            self.memory_profiler.log(self.request, self.memory_profiler.get_summary(len(self.request.data)))
+        finally:
+            self.memory_profiler.stop()
+
+    def can_profile(self, request) -> bool:
+        """Only staff users may request a profile, or everyone if DEBUG is enabled"""
+        return settings.DEBUG or getattr(request.user, "is_staff", False)
+
+    def should_profile(self, request) -> bool:
+        return bool(self.profile_directory and request.headers.get(self.profile_header) and self.can_profile(request))
+
+    def get_profile_path(self, request) -> str:
+        """Return the path of the profile, keyed by the request id and the number of operations"""
+        request_id = request.headers.get("X-Request-ID", "")
+        if not SAFE_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid4().hex
+        return os.path.join(
+            self.profile_directory, f"{request_id}-{len(request.data)}ops.{self.profiler.file_extension}")
+
+    def should_run_as_job(self, request) -> bool:
+        if self.job_executor is None or self.dry_run:
+            return False
+        if self.job_min_operations is not None and len(request.data) >= self.job_min_operations:
+            return True
+        preferences = [preference.split(";")[0].strip().lower()
+                       for preference in request.headers.get("Prefer", "").split(",")]
+        return "respond-async" in preferences
+
+    def get_job_url(self, job: Job) -> str:
+        if not self.job_url_name:
+            raise ImproperlyConfigured("You need to define the `job_url_name` to execute documents as jobs.")
+        return reverse(self.job_url_name, kwargs={"pk": job.id}, request=self.request)
+
+    def start_job(self, parsed_operations: List[Dict]) -> HttpResponse:
+        """Store the parsed document as job, pass it to the job executor and respond with the job resource"""
+        # denied operations are reported before the document is accepted
+        self.check_operation_permissions(parsed_operations)
+        job = Job(parsed_operations, getattr(self.request.user, "pk", None))
+        # the url is resolved first, so a misconfigured view does not leave jobs behind
+        url = self.get_job_url(job)
+        self.job_store.save(job)
+        self.job_executor.submit(self.run_job, job)
+        return HttpResponse(
+            job.render(url), status=status.HTTP_202_ACCEPTED, content_type=ATOMIC_CONTENT_TYPE, headers={"Location": url})
+
+    def run_job(self, job: Job):
+        """Perform the operations of the job with the same all-or-nothing semantics as a request and store the response"""
+        job.status = Job.RUNNING
+        self.job_store.save(job)
+        # the rendered results are stored in the job, so they are not streamed
+        self.stream_results = False
+        try:
+            with self.admission_controller.admit(job.operations):
+                response = self.perform_operations(job.operations)
+        except Exception as exc:
+            try:
+                response = self.handle_exception(exc)
+            except Exception:
+                job_logger.exception("atomic operations job %s failed", job.id)
+                response = self.handle_exception(APIException())
+
+        content = b""
+        if response.status_code != status.HTTP_204_NO_CONTENT:
+            content = AtomicResultRenderer().render(
+                response.data, ATOMIC_CONTENT_TYPE, {"view": self, "request": self.request, "response": response})
+        job.finish(response.status_code, content)
+        self.job_store.save(job)
+
     def post(self, request, *args, **kwargs):
-        return self.perform_operations(request.data)
+        if self.should_run_as_job(request):
+            return self.start_job(request.data)
+        if self.should_profile(request):
+            self.profiler = self.profiler_class()
+            self.profiler.start()
+        with self.tracer.start_as_current_span("atomic_operations") as span:
+            parsed_operations = request.data
+            span.set_attribute("atomic.operations", len(parsed_operations))
+            with self.admission_controller.admit(parsed_operations), self.memory_profiler.measure("execute"):
+                if self.group_commit is not None:
+                    return self.group_commit.submit(self.perform_operations, parsed_operations)
+                return self.perform_operations(parsed_operations)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, StreamingHttpResponse) and self.memory_profiler.enabled:
+            # the memory is reported once the execute phase is measured, rendered responses report it while rendering
+            self.report_memory()
+        if self.profiler is not None:
+            # render inside of the profile, so the rendering shows up in it as well
+            try:
+                if isinstance(response, Response):
+                    response.render()
+            finally:
+                self.profiler.stop()
+            path = self.get_profile_path(request)
+            os.makedirs(self.profile_directory, exist_ok=True)
+            self.profiler.dump(path)
+            response[self.profile_header] = os.path.basename(path)
+        return response
 
-    def handle_sequential(self, serializer, operation_code):
+    def handle_sequential(self, serializer, operation_code, idx: int = None):
         if operation_code in ["add", "update", "update-relationship"]:
             lid = serializer.initial_data.get("lid", None)
 
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            if operation_code == "add" and serializer.initial_data["type"] in self.upsert_fields:
+                serializer.instance = self.get_upsert_instance(idx, serializer)
+                self.perform_upsert(serializer.initial_data["type"], [serializer], [serializer.instance])
+            elif operation_code != "add" and serializer.initial_data["type"] in self.blind_update_types:
+                self.perform_blind_updates(serializer.initial_data["type"], {idx: serializer})
+            else:
+                serializer.save()
 
             if operation_code == "add" and lid:
                 resource_type = serializer.initial_data["type"]
-                self.lid_to_id[resource_type][lid] = serializer.data["id"]
+                self.lid_to_id[resource_type][lid] = serializer.instance.pk
 
             if operation_code != "update-relationship":
-                self.response_data.append(serializer.data)
+                self.add_result(serializer.__class__, serializer.instance)
+        elif self.can_fast_remove(serializer.initial_data["type"], serializer.Meta.model):
+            self.perform_fast_remove(serializer.Meta.model, serializer.initial_data["type"], {idx: serializer.initial_data["id"]})
         else:
             # remove
             serializer.instance.delete()
@@ -115,113 +709,676 @@ class AtomicOperationView(APIView):
     def perform_bulk_create(self, bulk_operation_data):
         objs = []
         model_class = bulk_operation_data["serializer_collection"][0].Meta.model
-        for _serializer in bulk_operation_data["serializer_collection"]:
+        resource_type = bulk_operation_data["serializer_collection"][0].initial_data["type"]
+        for idx, _serializer in zip(bulk_operation_data["indices"], bulk_operation_data["serializer_collection"]):
             _serializer.is_valid(raise_exception=True)
-            instance = model_class(**_serializer.validated_data)
+            if resource_type in self.upsert_fields:
+                instance = self.get_upsert_instance(idx, _serializer)
+            else:
+                instance = model_class(**_serializer.validated_data)
             objs.append(instance)
-        model_class.objects.bulk_create(
-            objs)
-        # append serialized data after save has successfully called. Otherwise id could be None. See #3
-        self.response_data.extend(
-            [_serializer.__class__(instance=obj).data for obj in objs])
+        if resource_type in self.upsert_fields:
+            self.perform_upsert(resource_type, bulk_operation_data["serializer_collection"], objs)
+        else:
+            model_class.objects.using(self.get_database_alias(
+                resource_type, model_class)).bulk_create(objs)
+
+        for _serializer, obj in zip(bulk_operation_data["serializer_collection"], objs):
+            lid = _serializer.initial_data.get("lid", None)
+            if lid:
+                self.lid_to_id[resource_type][lid] = obj.pk
+
+        # add the results after save has successfully called. Otherwise id could be None. See #3
+        serializer_class = bulk_operation_data["serializer_collection"][0].__class__
+        for obj in objs:
+            self.add_result(serializer_class, obj)
+
+    def get_upsert_instance(self, idx: int, serializer):
+        """Return the unsaved instance of an upsert. Many to many relationships can not be set by `bulk_create()`"""
+        model_class = serializer.Meta.model
+        for field_name, field in serializer.fields.items():
+            if field.source not in serializer.validated_data:
+                continue
+            try:
+                model_field = model_class._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.many_to_many:
+                raise ManyToManyUpsert(idx, format_field_name(field_name))
+        return model_class(**serializer.validated_data)
+
+    def perform_upsert(self, resource_type: str, serializers: List, objs: List):
+        """Insert the objects or update the existing rows with the same values of the unique fields
+
+        Every chunk is one `bulk_create(update_conflicts=True)` statement. The primary keys of the inserted and updated
+        rows are looked up by the unique fields afterwards, if the database does not return them.
+        """
+        model_class = serializers[0].Meta.model
+        unique_fields = self.upsert_fields[resource_type]
+        update_fields = []
+        for serializer in serializers:
+            for field_name in serializer.validated_data:
+                model_field = model_class._meta.get_field(field_name)
+                if field_name not in unique_fields and field_name not in update_fields and model_field.concrete and \
+                        not model_field.many_to_many:
+                    update_fields.append(field_name)
+        if update_fields:
+            # `bulk_create` sets the `auto_now` fields of the objects, but only updates the listed fields on conflict
+            update_fields.extend(
+                model_field.name for model_field in model_class._meta.concrete_fields
+                if getattr(model_field, "auto_now", False) and model_field.name not in update_fields + unique_fields
+            )
+
+        queryset = model_class.objects.using(self.get_database_alias(resource_type, model_class))
+        for chunk in self.get_upsert_chunks(model_class, objs, unique_fields):
+            if update_fields:
+                queryset.bulk_create(
+                    chunk, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields)
+            else:
+                queryset.bulk_create(chunk, ignore_conflicts=True)
+        self.set_upsert_pks(queryset, objs, unique_fields)
+
+    def get_unique_values(self, obj, attnames: List[str]) -> tuple:
+        return tuple(getattr(obj, attname) for attname in attnames)
+
+    def get_upsert_chunks(self, model_class, objs: List, unique_fields: List[str]) -> List[List]:
+        """Split the objects, so no chunk contains the same unique values twice. One statement can not update a row twice"""
+        attnames = [model_class._meta.get_field(field_name).attname for field_name in unique_fields]
+        chunks = [[]]
+        seen = set()
+        for obj in objs:
+            values = self.get_unique_values(obj, attnames)
+            if values in seen:
+                chunks.append([])
+                seen = set()
+            seen.add(values)
+            chunks[-1].append(obj)
+        return chunks
+
+    def set_upsert_pks(self, queryset, objs: List, unique_fields: List[str]):
+        """Look up the primary keys of all upserted objects which are not returned by the database with one query"""
+        missing = [obj for obj in objs if obj.pk is None]
+        if not missing:
+            return
+        attnames = [queryset.model._meta.get_field(field_name).attname for field_name in unique_fields]
+        if len(attnames) == 1:
+            condition = Q(**{f"{attnames[0]}__in": {getattr(obj, attnames[0]) for obj in missing}})
+        else:
+            condition = Q()
+            for obj in missing:
+                condition |= Q(**{attname: getattr(obj, attname) for attname in attnames})
+        pks = {tuple(row[:-1]): row[-1] for row in queryset.filter(condition).values_list(*attnames, "pk")}
+        for obj in missing:
+            obj.pk = pks.get(self.get_unique_values(obj, attnames))
+            obj._state.adding = False
+
+    def add_result(self, serializer_class, instance):
+        """Add the saved instance as pending result. Pending results are serialized together by `flush_results`"""
+        self.pending_results.append(len(self.response_data))
+        self.pending_resources.add(
+            (get_resource_type_from_serializer(serializer_class), str(instance.pk)))
+        self.response_data.append((serializer_class, instance))
+
+    def must_flush_results(self, operation_code: str, obj: Dict) -> bool:
+        """Pending results need to be serialized before an operation which could change them is performed
+
+        These are all `remove` operations, which could cascade, upserts of a resource type with pending results and all
+        operations which target or refer to a resource with a pending result.
+        """
+        if not self.pending_resources:
+            return False
+        if operation_code == "remove":
+            return True
+        if operation_code == "add" and obj["type"] in self.upsert_fields and \
+                any(resource_type == obj["type"] for resource_type, _ in self.pending_resources):
+            # upserts could update any resource of their type
+            return True
+        return any(
+            (identifier["type"], str(identifier.get("id"))) in self.pending_resources
+            for identifier in [obj] + self.get_resource_identifiers(obj)
+        )
+
+    def flush_results(self):
+        """Serialize all pending results and replace them in the response data"""
+        results = [self.response_data[position] for position in self.pending_results]
+        for position, result in zip(self.pending_results, self.serialize_results(results)):
+            self.response_data[position] = result
+        self.pending_results = []
+        self.pending_resources = set()
+
+    def get_result_queryset(self, serializer):
+        """Return the queryset which loads the instances of the results together with their relationships"""
+        model = serializer.Meta.model
+        select_related = []
+        prefetch_related = []
+        for field_name, field in serializer.fields.items():
+            if field.write_only or "." in field.source or field.source == "*":
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if isinstance(field, ManyRelatedField) and (model_field.many_to_many or model_field.one_to_many):
+                prefetch_related.append(field.source)
+            elif isinstance(field, RelatedField) and not field.use_pk_only_optimization() and \
+                    model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+                select_related.append(field.source)
+        for lookup in self.get_include_lookups(serializer):
+            if lookup not in select_related and lookup not in prefetch_related:
+                prefetch_related.append(lookup)
+
+        queryset = model.objects.using(self.get_database_alias(
+            get_resource_type_from_serializer(serializer), model))
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def get_include_lookups(self, serializer) -> List[str]:
+        """Return one prefetch lookup per include path which is supported by the serializer
+
+        Included resources are loaded together for all results of the serializer, so including them does not cost
+        any query per result.
+        """
+        lookups = []
+        for path in get_included_resources(self.request, serializer):
+            current_serializer = serializer
+            model = serializer.Meta.model
+            sources = []
+            for field_name in path.split("."):
+                field_name = inflection.underscore(field_name)
+                included_serializers = getattr(current_serializer, "included_serializers", None) or {}
+                field = current_serializer.fields.get(field_name)
+                if field_name not in included_serializers or field is None or "." in field.source or field.source == "*":
+                    break
+                try:
+                    model_field = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    break
+                if not model_field.is_relation:
+                    break
+                sources.append(field.source)
+                current_serializer = included_serializers[field_name](context=serializer.context)
+                model = model_field.related_model
+            if sources:
+                lookups.append("__".join(sources))
+        return lookups
+
+    def serialize_results(self, results: List) -> List[AtomicResult]:
+        """Serialize the `(serializer class, instance)` results with one query and one `many=True` serializer per type"""
+        context = self.get_serializer_context()
+        groups = defaultdict(list)
+        for position, (serializer_class, instance) in enumerate(results):
+            groups[serializer_class].append((position, instance))
+
+        serialized_results = [None] * len(results)
+        for serializer_class, items in groups.items():
+            queryset = self.get_result_queryset(serializer_class(context=context))
+            refetched_instances = queryset.in_bulk([instance.pk for _, instance in items])
+            instances = [refetched_instances.get(instance.pk, instance) for _, instance in items]
+            serializer = serializer_class(instances, many=True, context=context)
+            for (position, _), data, instance in zip(items, serializer.data, instances):
+                serialized_results[position] = AtomicResult(data, serializer=serializer.child, instance=instance)
+        return serialized_results
+
+    def iter_results(self) -> Iterator[Dict]:
+        """Serialize the collected results chunk by chunk and release them as soon as they are serialized"""
+        results = deque(self.response_data)
+        self.response_data = []
+        with route_models(self.get_model_database_aliases()):
+            while results:
+                chunk = [results.popleft() for _ in range(min(self.stream_chunk_size, len(results)))]
+                yield from self.serialize_results(chunk)
+
+    def get_streaming_response(self) -> StreamingHttpResponse:
+        renderer = AtomicResultRenderer()
+        response = StreamingHttpResponse(
+            renderer.render_stream(self.iter_results(), self.response_meta, self.stream_chunk_size, self.request),
+            content_type=ATOMIC_CONTENT_TYPE
+        )
+        # the results are rendered while the response is sent, so the render phase is not part of the reports
+        if self.timer.enabled:
+            self.report_timings(response)
+        return response
+
+    def perform_bulk_blind_update(self, operation_code: str, bulk_operation_data):
+        """Apply the blind updates of the batch in segments which change every resource at most once
+
+        The results of a segment are serialized before the next segment changes their resources again, so every result
+        shows the state after its own operation.
+        """
+        resource_type = bulk_operation_data["serializer_collection"][0].initial_data["type"]
+        segments = [{}]
+        segment_ids = set()
+        for idx, serializer in zip(bulk_operation_data["indices"], bulk_operation_data["serializer_collection"]):
+            serializer.is_valid(raise_exception=True)
+            if str(serializer.initial_data["id"]) in segment_ids:
+                segments.append({})
+                segment_ids = set()
+            segments[-1][idx] = serializer
+            segment_ids.add(str(serializer.initial_data["id"]))
+
+        for position, serializers in enumerate(segments):
+            if position and not self.stream_results:
+                self.flush_results()
+            self.perform_blind_updates(resource_type, serializers)
+            if operation_code != "update-relationship":
+                for serializer in serializers.values():
+                    self.add_result(serializer.__class__, serializer.instance)
 
     def perform_bulk_delete(self, bulk_operation_data):
+        resource_type = bulk_operation_data["serializer_collection"][0].initial_data["type"]
+        if self.can_fast_remove(resource_type, bulk_operation_data["serializer_collection"][0].Meta.model):
+            self.perform_fast_remove(
+                bulk_operation_data["serializer_collection"][0].Meta.model,
+                resource_type,
+                {idx: _serializer.initial_data["id"] for idx, _serializer in zip(
+                    bulk_operation_data["indices"], bulk_operation_data["serializer_collection"])}
+            )
+            return
+
         obj_ids = []
         for _serializer in bulk_operation_data["serializer_collection"]:
             obj_ids.append(_serializer.instance.pk)
-            self.response_data.append(_serializer.data)
-        bulk_operation_data["serializer_collection"][0].Meta.model.objects.filter(
+        model_class = bulk_operation_data["serializer_collection"][0].Meta.model
+        model_class.objects.using(self.get_database_alias(
+            bulk_operation_data["serializer_collection"][0].initial_data["type"], model_class)).filter(
             pk__in=obj_ids).delete()
 
+    def can_fast_remove(self, resource_type: str, model_class) -> bool:
+        if resource_type in self.fast_remove_types:
+            return True
+        if not self.detect_fast_removes:
+            return False
+        if model_class not in self.fast_removable_models:
+            self.fast_removable_models[model_class] = self.is_fast_removable(model_class)
+        return self.fast_removable_models[model_class]
+
+    def is_fast_removable(self, model_class) -> bool:
+        """Return whether the rows of the model can be deleted without the deletion collector of django
+
+        This is the case if the model has no custom `delete()`, no delete signal receivers, no parent models, no generic
+        relations and all foreign keys to it are handled by the database. Rows of auto created many to many tables are
+        deleted by `delete_rows()`, so their tables only must not have delete signal receivers.
+        """
+        opts = model_class._meta
+        if model_class.delete is not Model.delete or self.has_delete_receivers(model_class) or opts.concrete_model._meta.parents:
+            return False
+        if any(hasattr(field, "bulk_related_objects") for field in opts.private_fields):
+            return False
+        for related in get_candidate_relations_to_delete(opts):
+            if related.related_model._meta.auto_created:
+                if self.has_delete_receivers(related.related_model):
+                    return False
+            elif related.field.remote_field.on_delete is not DO_NOTHING:
+                return False
+        return True
+
+    def has_delete_receivers(self, model_class) -> bool:
+        return signals.pre_delete.has_listeners(model_class) or signals.post_delete.has_listeners(model_class)
+
+    def get_chunks(self, pks: List, chunk_size: int) -> Iterator[List]:
+        for start in range(0, len(pks), chunk_size):
+            yield pks[start:start + chunk_size]
+
+    def raise_object_does_not_exist(self, model_class, alias: str, pks: Dict, chunk_size: int):
+        """Raise the errors of the operations whose primary keys do not exist"""
+        existing = {str(pk) for chunk in self.get_chunks(list(pks.values()), chunk_size)
+                    for pk in model_class._base_manager.using(alias).filter(pk__in=chunk).values_list("pk", flat=True)}
+        raise UnprocessableEntity([
+            self.get_object_does_not_exist_error(idx, pk) for idx, pk in pks.items() if str(pk) not in existing
+        ])
+
+    def perform_fast_remove(self, model_class, resource_type: str, pks: Dict):
+        """Delete the rows of the given primary keys by operation index without loading them first
+
+        The rows are deleted in chunks of `fast_remove_chunk_size` primary keys. The number of deleted rows detects
+        unknown ids. In that case the deletion is rolled back to find the operations which refer to them.
+        """
+        alias = self.get_database_alias(resource_type, model_class)
+        unique_pks = list({str(pk): pk for pk in pks.values()}.values())
+        try:
+            with atomic(using=alias):
+                deleted = sum(self.delete_rows(model_class, alias, chunk)
+                              for chunk in self.get_chunks(unique_pks, self.fast_remove_chunk_size))
+                if deleted != len(unique_pks):
+                    raise ObjectDoesNotExist()
+        except ObjectDoesNotExist:
+            self.raise_object_does_not_exist(model_class, alias, pks, self.fast_remove_chunk_size)
+
+    def delete_rows(self, model_class, alias: str, pks: List) -> int:
+        """Delete the rows and their rows of auto created many to many tables with one query per table"""
+        for field in model_class._meta.get_fields(include_hidden=True):
+            if not field.many_to_many:
+                continue
+            if field.concrete:
+                through, field_name = field.remote_field.through, field.m2m_field_name()
+            else:
+                through, field_name = field.through, field.field.m2m_reverse_field_name()
+            if through._meta.auto_created:
+                through._base_manager.using(alias).filter(**{f"{field_name}__in": pks})._raw_delete(alias)
+        return model_class._base_manager.using(alias).filter(pk__in=pks)._raw_delete(alias)
+
+    def get_blind_update_values(self, serializer, auto_now_values: Dict) -> Dict:
+        """Return the column values of the validated data or None if they can not be applied by `update()`
+
+        Many to many relationships and attributes which are no model fields need the instance and `serializer.save()`.
+        The values of `auto_now` fields are added, because `update()` does not set them.
+        """
+        model_class = serializer.Meta.model
+        values = dict(auto_now_values)
+        for source, value in serializer.validated_data.items():
+            try:
+                model_field = model_class._meta.get_field(source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            values[model_field.name] = value
+        return values
+
+    def get_auto_now_values(self, model_class) -> Dict:
+        """Return the current values of the `auto_now` fields. They are the same for all operations of a batch"""
+        instance = model_class()
+        return {
+            model_field.name: model_field.pre_save(instance, False)
+            for model_field in model_class._meta.concrete_fields if getattr(model_field, "auto_now", False)
+        }
+
+    def get_blind_update_key(self, values: Dict):
+        """Return the key which groups equal changes or None if the values are not hashable"""
+        key = tuple(sorted(values.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def perform_blind_updates(self, resource_type: str, serializers: Dict):
+        """Apply the validated changes of the serializers by operation index without loading the instances first
+
+        Consecutive operations with equal changes are applied by one UPDATE per `blind_update_chunk_size` primary keys.
+        An operation which targets a resource that is already changed by the pending UPDATEs applies them first, so
+        the changes of one resource keep the order of the operations. Changes which can not be applied by `update()`
+        load the instance and are saved by the serializer.
+        """
+        model_class = next(iter(serializers.values())).Meta.model
+        alias = self.get_database_alias(resource_type, model_class)
+        auto_now_values = self.get_auto_now_values(model_class)
+        groups = {}
+        pending_pks = set()
+        for idx, serializer in serializers.items():
+            pk = model_class._meta.pk.to_python(serializer.initial_data["id"])
+            values = self.get_blind_update_values(serializer, auto_now_values)
+            if values is None or pk in pending_pks:
+                self.perform_blind_update_groups(model_class, alias, groups)
+                groups = {}
+                pending_pks = set()
+            if values is None:
+                serializer.instance = self.get_instance(idx, resource_type, model_class, pk)
+                serializer.save()
+                continue
+            serializer.instance = model_class(pk=pk)
+            pending_pks.add(pk)
+            key = self.get_blind_update_key(values)
+            groups.setdefault(key if key is not None else ("operation", idx), (values, {}))[1][idx] = pk
+        self.perform_blind_update_groups(model_class, alias, groups)
+
+    def perform_blind_update_groups(self, model_class, alias: str, groups: Dict):
+        # updated rows stay in place, so unknown ids can be looked up without a savepoint. The document transaction is
+        # rolled back by the raised error anyway
+        for values, pks in groups.values():
+            updated = sum(model_class._base_manager.using(alias).filter(pk__in=chunk).update(**values)
+                          for chunk in self.get_chunks(list(pks.values()), self.blind_update_chunk_size))
+            if updated != len(pks):
+                self.raise_object_does_not_exist(model_class, alias, pks, self.blind_update_chunk_size)
+
     def handle_bulk(self, serializer, current_operation_code, bulk_operation_data):
         bulk_operation_data["serializer_collection"].append(serializer)
         if bulk_operation_data["next_operation_code"] != current_operation_code or bulk_operation_data["next_resource_type"] != serializer.initial_data["type"]:
-            if current_operation_code == "add":
-                self.perform_bulk_create(bulk_operation_data)
-            elif current_operation_code == "delete":
-                self.perform_bulk_delete(bulk_operation_data)
-            else:
-                # TODO: update in bulk requires more logic cause it could be a partial update and every field differs pers instance.
-                # Then we can't do a bulk operation. This is only possible for instances which changes the same field(s).
-                # Maybe the anylsis of this takes longer than simple handling updates in sequential mode.
-                # For now we handle updates always in sequential mode
-                self.handle_sequential(
-                    bulk_operation_data["serializer_collection"][0], current_operation_code)
+            resource_type = serializer.initial_data["type"]
+            size = len(bulk_operation_data["serializer_collection"])
+            span_name = self.get_write_strategy(current_operation_code, resource_type, bulk=True)
+            span_attributes = {"atomic.op": current_operation_code, "atomic.type": resource_type, "atomic.rows": size}
+            with self.timer.measure("bulk", current_operation_code, resource_type), \
+                    self.query_recorder.bulk(current_operation_code, resource_type, size), \
+                    self.tracer.start_as_current_span(span_name, attributes=span_attributes):
+                if current_operation_code == "add":
+                    self.perform_bulk_create(bulk_operation_data)
+                elif current_operation_code == "remove":
+                    self.perform_bulk_delete(bulk_operation_data)
+                elif resource_type in self.blind_update_types:
+                    self.perform_bulk_blind_update(current_operation_code, bulk_operation_data)
+                else:
+                    # TODO: update in bulk requires more logic cause it could be a partial update and every field differs pers instance.
+                    # Then we can't do a bulk operation. This is only possible for instances which changes the same field(s).
+                    # Maybe the anylsis of this takes longer than simple handling updates in sequential mode.
+                    # For now we handle updates always in sequential mode
+                    for idx, _serializer in zip(bulk_operation_data["indices"], bulk_operation_data["serializer_collection"]):
+                        # earlier results of the batch could be changed by this operation
+                        if not self.stream_results and self.must_flush_results(current_operation_code, _serializer.initial_data):
+                            self.flush_results()
+                        self.handle_sequential(
+                            _serializer, current_operation_code, idx)
             bulk_operation_data["serializer_collection"] = []
+            bulk_operation_data["indices"] = []
 
-    def substitute_lids(self, data, idx, should_raise_unknown_lid_error):
-        if not isinstance(data, dict):
-            return
+    def get_lid_references(self, parsed_operations: List[Dict]) -> Dict:
+        """Return the locations of the lids by operation index, as recorded by the parser"""
+        lid_references = getattr(parsed_operations, "lid_references", None)
+        if lid_references is not None:
+            return lid_references
 
-        try:
-            lid = data.get("lid", None)
-            if lid:
-                resource_type = data["type"]
-                data["id"] = self.lid_to_id[resource_type][lid]
-        except KeyError:
-            if should_raise_unknown_lid_error:
+        # operations which are not parsed by the `AtomicOperationParser`
+        lid_references = {}
+        for idx, operation in enumerate(parsed_operations):
+            obj = next(iter(operation.values()))
+            references = [
+                LidReference(identifier, "data/lid") for identifier in [obj] + self.get_resource_identifiers(obj)
+                if identifier.get("lid")
+            ]
+            if references:
+                lid_references[idx] = references
+        return lid_references
+
+    def substitute_lids(self, idx: int, operation_code: str, obj: Dict):
+        """Set the ids of all resource identifiers of the operation which refer to resources added by earlier operations"""
+        for reference in self.lid_references.get(idx, []):
+            identifier = reference.identifier
+            try:
+                identifier["id"] = self.lid_to_id[identifier["type"]][identifier["lid"]]
+            except KeyError:
+                if operation_code == "add" and identifier is obj:
+                    # the lid of the added resource itself
+                    continue
                 raise UnprocessableEntity([
                     {
                         "id": "unknown-lid",
-                        "detail": f'Object with lid `{lid}` received for operation with index `{idx}` does not exist',
+                        "detail": f'Object with lid `{identifier["lid"]}` received for operation with index `{idx}` does not exist',
                         "source": {
-                            "pointer": f"/{ATOMIC_OPERATIONS}/{idx}/data/lid"
+                            "pointer": f"/{ATOMIC_OPERATIONS}/{idx}/{reference.pointer}"
                         },
                         "status": "422"
                     }
                 ])
-            
-        for _, value in data.items():
-            if isinstance(value, dict):
-                self.substitute_lids(value, idx, should_raise_unknown_lid_error=True)
-            elif isinstance(value, list):
-                [self.substitute_lids(value, idx, should_raise_unknown_lid_error=True) for value in value]
-
-        return data     
-        
-    def perform_operations(self, parsed_operations: List[Dict]):
-        self.response_data = []  # reset local response data storage
 
+    def handle_operations(self, parsed_operations: List[Dict], validated_serializers: Dict):
         bulk_operation_data = {
             "serializer_collection": [],
+            "indices": [],
             "next_operation_code": "",
             "next_resource_type": ""
         }
 
-        with atomic():
+        for idx, operation in enumerate(parsed_operations):
+            operation_code = next(iter(operation))
+            with self.query_recorder.operation(idx, operation_code, operation[operation_code]["type"]):
+                self.handle_operation(
+                    idx, operation_code, parsed_operations, validated_serializers, bulk_operation_data)
+
+    def handle_operation(self, idx, operation_code, parsed_operations, validated_serializers, bulk_operation_data):
+        operation = parsed_operations[idx]
+        serializer = validated_serializers.get(idx)
+        if serializer is None:
+            serializer = self.get_operation_serializer(
+                idx, operation_code, operation[operation_code])
+            self.validate_operation(idx, serializer, operation_code)
 
-            for idx, operation in enumerate(parsed_operations):
-                operation_code = next(iter(operation))
-                obj = operation[operation_code]
+        if not self.stream_results and self.must_flush_results(operation_code, serializer.initial_data):
+            self.flush_results()
 
-                should_raise_unknown_lid_error = operation_code != "add"
-                self.substitute_lids(obj, idx, should_raise_unknown_lid_error)
+        if self.sequential:
+            span_attributes = {
+                "atomic.op": operation_code, "atomic.type": serializer.initial_data["type"], "atomic.index": idx, "atomic.rows": 1}
+            with self.timer.measure("write", operation_code, serializer.initial_data["type"]), \
+                    self.tracer.start_as_current_span(
+                        self.get_write_strategy(operation_code, serializer.initial_data["type"], bulk=False),
+                        attributes=span_attributes):
+                self.handle_sequential(serializer, operation_code, idx)
+        else:
+            bulk_operation_data["indices"].append(idx)
+            is_last_iter = parsed_operations.__len__() == idx + 1
+            if is_last_iter:
+                bulk_operation_data["next_operation_code"] = ""
+                bulk_operation_data["next_resource_type"] = ""
+            else:
+                next_operation = parsed_operations[idx + 1]
+                bulk_operation_data["next_operation_code"] = next(
+                    iter(next_operation))
+                bulk_operation_data["next_resource_type"] = next_operation[bulk_operation_data["next_operation_code"]]["type"]
 
-                serializer = self.get_serializer(
-                    idx=idx,
-                    data=obj,
-                    operation_code="update" if operation_code == "update-relationship" else operation_code,
-                    resource_type=obj["type"],
-                    partial=True if "update" in operation_code else False
-                )
+            self.handle_bulk(
+                serializer=serializer,
+                current_operation_code=operation_code,
+                bulk_operation_data=bulk_operation_data
+            )
 
-                if self.sequential:
-                    self.handle_sequential(serializer, operation_code)
-                else:
-                    is_last_iter = parsed_operations.__len__() == idx + 1
-                    if is_last_iter:
-                        bulk_operation_data["next_operation_code"] = ""
-                        bulk_operation_data["next_resource_type"] = ""
-                    else:
-                        next_operation = parsed_operations[idx + 1]
-                        bulk_operation_data["next_operation_code"] = next(
-                            iter(next_operation))
-                        bulk_operation_data["next_resource_type"] = next_operation[bulk_operation_data["next_operation_code"]]["type"]
-
-                    self.handle_bulk(
-                        serializer=serializer,
-                        current_operation_code=operation_code,
-                        bulk_operation_data=bulk_operation_data
-                    )
+    def get_write_strategy(self, operation_code: str, resource_type: str, bulk: bool) -> str:
+        """Return the name of the method which writes the operations, used by the tracing spans and the execution plan"""
+        if operation_code == "add" and resource_type in self.upsert_fields:
+            return "perform_upsert"
+        if operation_code == "remove" and self.can_fast_remove(
+                resource_type, self.get_serializer_class(operation_code, resource_type).Meta.model):
+            return "perform_fast_remove"
+        if operation_code in ["update", "update-relationship"] and resource_type in self.blind_update_types:
+            return "perform_blind_updates"
+        if bulk:
+            return BULK_SPAN_NAMES.get(operation_code, "handle_sequential")
+        return "handle_sequential"
+
+    def get_execution_plan(self) -> Dict:
+        """Return the batches of the performed operations with their strategy and the issued queries
+
+        Every operation of the sequential mode is a batch of its own. The batches of the bulk mode are the bulk flushes,
+        which cover consecutive operations. Queries which are not issued by any operation, e.g. the prefetching of the
+        related resources, are listed separately.
+        """
+        recorder = self.query_recorder
+        sql_by_scope = defaultdict(list)
+        for scope, sql, _ in recorder.queries:
+            sql_by_scope[scope].append(sql)
+        operation_scopes = {
+            scope["index"]: idx for idx, scope in enumerate(recorder.scopes) if scope["kind"] == "operation"}
+
+        batches = []
+        if self.sequential:
+            for index, scope in operation_scopes.items():
+                batches.append({
+                    "op": recorder.scopes[scope]["op"],
+                    "type": recorder.scopes[scope]["type"],
+                    "strategy": self.get_write_strategy(
+                        recorder.scopes[scope]["op"], recorder.scopes[scope]["type"], bulk=False),
+                    "size": 1,
+                    "operations": [index],
+                    "sql": sql_by_scope[scope]
+                })
+        else:
+            start = 0
+            for scope, bulk in enumerate(recorder.scopes):
+                if bulk["kind"] != "bulk":
+                    continue
+                indices = list(range(start, start + bulk["size"]))
+                start += bulk["size"]
+                batches.append({
+                    "op": bulk["op"],
+                    "type": bulk["type"],
+                    "strategy": self.get_write_strategy(bulk["op"], bulk["type"], bulk=True),
+                    "size": bulk["size"],
+                    "operations": indices,
+                    # the queries of the operations, e.g. by their validation, followed by the queries of the flush
+                    "sql": [sql for index in indices for sql in sql_by_scope[operation_scopes[index]]] + sql_by_scope[scope]
+                })
+
+        return {
+            "mode": "sequential" if self.sequential else "bulk",
+            "batches": batches,
+            "unbatched_sql": sql_by_scope[None]
+        }
+
+    def perform_operations(self, parsed_operations: List[Dict]):
+        self.response_data = []  # reset local response data storage
+        self.response_meta = {}
+        self.related_instances = {}
+        self.pending_results = []
+        self.pending_resources = set()
+        self.lid_to_id = defaultdict(dict)
+        # receivers of delete signals may be connected at runtime, so the models are checked again for every request
+        self.fast_removable_models = {}
+        self.lid_references = self.get_lid_references(parsed_operations)
+
+        with route_models(self.get_model_database_aliases()), self.query_recorder.record():
+            with self.timer.measure("permissions"):
+                self.check_operation_permissions(parsed_operations)
+
+            if self.prefetch_relationships:
+                with self.timer.measure("prefetch"):
+                    self.prefetch_related_instances(parsed_operations)
+
+            validated_serializers = self.prevalidate_operations(
+                parsed_operations) if self.validate_before_transaction or self.validation_workers else {}
+
+            # one transaction per touched database. They are committed together after all operations are handled and
+            # rolled back together if any operation fails.
+            aliases = self.get_used_database_aliases(parsed_operations)
+            with ExitStack() as transactions:
+                for alias in aliases:
+                    transactions.enter_context(atomic(using=alias))
+
+                self.handle_operations(parsed_operations, validated_serializers)
+                if not self.stream_results:
+                    self.flush_results()
+
+                if self.dry_run:
+                    for alias in aliases:
+                        set_rollback(True, using=alias)
+
+        if self.query_recorder.enabled:
+            self.response_meta["queries"] = self.query_recorder.get_summary()
+            self.query_recorder.log(self.request, self.response_meta["queries"])
+        if self.dry_run:
+            self.response_meta["plan"] = self.get_execution_plan()
+
+        if self.stream_results and self.response_data:
+            return self.get_streaming_response()
 
         return Response(self.response_data, status=status.HTTP_200_OK if self.response_data else status.HTTP_204_NO_CONTENT)
+
+
+class AtomicJobView(APIView):
+    """View which returns the status of a job and the response of its document once it is finished"""
+
+    renderer_classes = [AtomicResultRenderer]
+    http_method_names = ["get"]
+
+    # needs to be the job store of the `AtomicOperationView`
+    job_store = DEFAULT_JOB_STORE
+
+    def get(self, request, pk, *args, **kwargs):
+        job = self.job_store.get(pk)
+        # jobs are only visible to the user who started them
+        if job is None or job.user_id != getattr(request.user, "pk", None):
+            raise NotFound()
+        if job.finished:
+            return HttpResponse(job.content, status=job.status_code, content_type=ATOMIC_CONTENT_TYPE)
+        return HttpResponse(job.render(request.build_absolute_uri()), content_type=ATOMIC_CONTENT_TYPE)
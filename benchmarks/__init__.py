@@ -0,0 +1,9 @@
+"""
+End-to-end benchmarks of the atomic operations views.
+
+Run them from the root of the project folder:
+
+.. code-block:: bash
+
+    $ python -m benchmarks.run --sizes 10,100,1000 --output results.json
+"""
@@ -0,0 +1,129 @@
+"""
+Synthetic atomic operations documents based on the models of the test project
+"""
+from typing import Callable, Dict, List
+
+from tests.models import BasicModel, RelatedModel, RelatedModelTwo
+
+
+TEXT = "JSON API paints my bikeshed!"
+
+
+def reset_database():
+    BasicModel.objects.all().delete()
+    RelatedModel.objects.all().delete()
+    RelatedModelTwo.objects.all().delete()
+
+
+def seed_database(size: int) -> Dict[str, List[str]]:
+    """Create the resources which are referenced by the documents and return their ids by resource type"""
+    RelatedModel.objects.bulk_create(
+        [RelatedModel(text=TEXT) for _ in range(2)])
+    RelatedModelTwo.objects.bulk_create(
+        [RelatedModelTwo(text=TEXT) for _ in range(2)])
+    BasicModel.objects.bulk_create([BasicModel(text=TEXT) for _ in range(size)])
+    return {
+        model.__name__: [str(pk) for pk in model.objects.order_by("pk").values_list("pk", flat=True)]
+        for model in [BasicModel, RelatedModel, RelatedModelTwo]
+    }
+
+
+def add_operations(size: int, fixtures: Dict) -> List[Dict]:
+    related_ids = fixtures["RelatedModel"]
+    return [
+        {
+            "op": "add",
+            "data": {
+                "type": "BasicModel",
+                "attributes": {
+                    "text": TEXT
+                },
+                "relationships": {
+                    "to_one": {
+                        "data": {"type": "RelatedModel", "id": related_ids[idx % len(related_ids)]}
+                    }
+                }
+            }
+        } for idx in range(size)
+    ]
+
+
+def update_operations(size: int, fixtures: Dict) -> List[Dict]:
+    return [
+        {
+            "op": "update",
+            "data": {
+                "id": pk,
+                "type": "BasicModel",
+                "attributes": {
+                    "text": f"{TEXT} {idx}"
+                }
+            }
+        } for idx, pk in enumerate(fixtures["BasicModel"][:size])
+    ]
+
+
+def remove_operations(size: int, fixtures: Dict) -> List[Dict]:
+    return [
+        {
+            "op": "remove",
+            "ref": {
+                "id": pk,
+                "type": "BasicModel"
+            }
+        } for pk in fixtures["BasicModel"][:size]
+    ]
+
+
+def relationship_operations(size: int, fixtures: Dict) -> List[Dict]:
+    return [
+        {
+            "op": "update",
+            "ref": {
+                "id": pk,
+                "type": "BasicModel",
+                "relationship": "to_many"
+            },
+            "data": [{"type": "RelatedModelTwo", "id": related_pk} for related_pk in fixtures["RelatedModelTwo"]]
+        } for pk in fixtures["BasicModel"][:size]
+    ]
+
+
+def lid_chain_operations(size: int, fixtures: Dict) -> List[Dict]:
+    """Pairs of a related resource and a resource which references it by `lid`"""
+    operations = []
+    for idx in range(size // 2):
+        operations.append({
+            "op": "add",
+            "data": {
+                "type": "RelatedModel",
+                "lid": f"related-{idx}",
+                "attributes": {
+                    "text": TEXT
+                }
+            }
+        })
+        operations.append({
+            "op": "add",
+            "data": {
+                "type": "BasicModel",
+                "attributes": {
+                    "text": TEXT
+                },
+                "relationships": {
+                    "to_one": {
+                        "data": {"type": "RelatedModel", "lid": f"related-{idx}"}
+                    }
+                }
+            }
+        })
+    return operations
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "add": add_operations,
+    "update": update_operations,
+    "remove": remove_operations,
+    "relationship": relationship_operations,
+    "lid-chain": lid_chain_operations,
+}
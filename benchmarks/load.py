@@ -0,0 +1,309 @@
+"""
+Fires concurrent atomic operations documents at the test project which is served by a live server.
+
+.. code-block:: bash
+
+    $ python -m benchmarks.load --shapes overlapping-updates,independent-adds,lid-chain --concurrency 8 --documents 200
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, Dict, List
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+
+TEXT = "JSON API paints my bikeshed!"
+
+
+def overlapping_updates(document: int, size: int, fixtures: Dict) -> List[Dict]:
+    """All documents update the same resources, every second document in reversed order"""
+    pks = fixtures["BasicModel"][:size]
+    if document % 2:
+        pks = list(reversed(pks))
+    return [
+        {
+            "op": "update",
+            "data": {
+                "id": pk,
+                "type": "BasicModel",
+                "attributes": {
+                    "text": f"{TEXT} {document}"
+                }
+            }
+        } for pk in pks
+    ]
+
+
+def independent_adds(document: int, size: int, fixtures: Dict) -> List[Dict]:
+    return [
+        {
+            "op": "add",
+            "data": {
+                "type": "BasicModel",
+                "attributes": {
+                    "text": f"{TEXT} {document}"
+                }
+            }
+        } for _ in range(size)
+    ]
+
+
+def lid_chain(document: int, size: int, fixtures: Dict) -> List[Dict]:
+    """
+    Pairs of a related resource and a resource which references it by `lid`. All documents use the same lids, but
+    every pair shares a unique text, so resources which are linked to the resource of another document can be found.
+    """
+    operations = []
+    for idx in range(max(size // 2, 1)):
+        text = f"lid-chain {document} {idx}"
+        operations.append({
+            "op": "add",
+            "data": {
+                "type": "RelatedModel",
+                "lid": f"related-{idx}",
+                "attributes": {
+                    "text": text
+                }
+            }
+        })
+        operations.append({
+            "op": "add",
+            "data": {
+                "type": "BasicModel",
+                "attributes": {
+                    "text": text
+                },
+                "relationships": {
+                    "to_one": {
+                        "data": {"type": "RelatedModel", "lid": f"related-{idx}"}
+                    }
+                }
+            }
+        })
+    return operations
+
+
+SHAPES: Dict[str, Callable] = {
+    "overlapping-updates": overlapping_updates,
+    "independent-adds": independent_adds,
+    "lid-chain": lid_chain,
+}
+
+
+class LoadRecorder:
+    """
+    Collects the database errors and slow queries of all server threads.
+
+    Queries which take longer than `lock_wait_threshold` seconds are counted as lock waits. Without database specific
+    lock statistics, this is the closest approximation of the time spent waiting for locks.
+    """
+
+    def __init__(self, lock_wait_threshold: float = 0.05):
+        self.lock_wait_threshold = lock_wait_threshold
+        self.deadlocks = 0
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            if duration >= self.lock_wait_threshold:
+                with self._lock:
+                    self.lock_waits += 1
+                    self.lock_wait_seconds += duration
+
+    def connection_created(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+    def got_request_exception(self, sender, request=None, **kwargs):
+        from django.db import OperationalError
+
+        error = sys.exc_info()[1]
+        message = str(error).lower()
+        if isinstance(error, OperationalError) and ("deadlock" in message or "locked" in message):
+            with self._lock:
+                self.deadlocks += 1
+
+    def connect(self):
+        from django.core.signals import got_request_exception
+        from django.db.backends.signals import connection_created
+
+        connection_created.connect(self.connection_created)
+        got_request_exception.connect(self.got_request_exception)
+
+    def disconnect(self):
+        from django.core.signals import got_request_exception
+        from django.db.backends.signals import connection_created
+
+        connection_created.disconnect(self.connection_created)
+        got_request_exception.disconnect(self.got_request_exception)
+
+
+def setup(database_name: str):
+    """Setup django with a file based test database, so every server thread uses its own connection"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+
+    settings.ROOT_URLCONF = "benchmarks.urls"
+    settings.DEBUG = False
+    connection.settings_dict["TEST"]["NAME"] = database_name
+    return connection.creation.create_test_db(verbosity=0)
+
+
+def get_live_server_case():
+    from django.test import LiveServerTestCase
+
+    class AtomicOperationsLiveServer(LiveServerTestCase):
+        databases = {"default"}
+
+    return AtomicOperationsLiveServer
+
+
+def send_document(url: str, operations: List[Dict]) -> (int, float):
+    from atomic_operations.consts import ATOMIC_CONTENT_TYPE, ATOMIC_OPERATIONS
+
+    request = Request(
+        url,
+        data=json.dumps({ATOMIC_OPERATIONS: operations}).encode(),
+        headers={"Content-Type": ATOMIC_CONTENT_TYPE, "Accept": ATOMIC_CONTENT_TYPE},
+        method="POST"
+    )
+    start = perf_counter()
+    try:
+        with urlopen(request) as response:
+            response.read()
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    except URLError:
+        status = None
+    return status, perf_counter() - start
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest rank percentile of the given values"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(int(round(percent / 100 * len(values))) - 1, 0)]
+
+
+def count_inconsistent_resources() -> int:
+    """Count the resources of the `lid-chain` shape which are linked to the related resource of another pair"""
+    from tests.models import BasicModel
+
+    return sum(
+        1 for text, related_text in BasicModel.objects.filter(text__startswith="lid-chain ").values_list("text", "to_one__text")
+        if text != related_text
+    )
+
+
+def run_load_test(base_url: str, shape: str, mode: str = "sequential", documents: int = 100, size: int = 10,
+                  concurrency: int = 4, lock_wait_threshold: float = 0.05) -> Dict:
+    from benchmarks.documents import reset_database, seed_database
+    from benchmarks.run import MODES
+
+    reset_database()
+    fixtures = seed_database(size)
+    url = base_url + MODES[mode]
+    payloads = [SHAPES[shape](document, size, fixtures) for document in range(documents)]
+
+    recorder = LoadRecorder(lock_wait_threshold)
+    recorder.connect()
+    # failing requests are counted, their tracebacks would hide the results
+    request_logger = logging.getLogger("django.request")
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda operations: send_document(url, operations), payloads))
+        seconds = perf_counter() - start
+    finally:
+        request_logger.setLevel(level)
+        recorder.disconnect()
+
+    latencies = [latency for _, latency in results]
+    errors = sum(1 for status, _ in results if status is None or status >= 400)
+    return {
+        "shape": shape,
+        "mode": mode,
+        "documents": documents,
+        "size": size,
+        "concurrency": concurrency,
+        "seconds": round(seconds, 6),
+        "documents_per_second": round(documents / seconds, 2) if seconds else None,
+        "ops_per_second": round(sum(len(operations) for operations in payloads) / seconds, 2) if seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        "errors": errors,
+        "error_rate": round(errors / documents, 4) if documents else None,
+        "deadlocks": recorder.deadlocks,
+        "deadlock_rate": round(recorder.deadlocks / documents, 4) if documents else None,
+        "lock_waits": recorder.lock_waits,
+        "lock_wait_seconds": round(recorder.lock_wait_seconds, 6),
+        "inconsistent": count_inconsistent_resources() if shape == "lid-chain" else 0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shapes", default=",".join(SHAPES),
+                        help="comma separated document shapes, all by default")
+    parser.add_argument("--modes", default="sequential,bulk")
+    parser.add_argument("--documents", type=int, default=100,
+                        help="number of documents per shape and mode")
+    parser.add_argument("--size", type=int, default=10,
+                        help="number of operations per document")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="number of threads which send documents")
+    parser.add_argument("--lock-wait-threshold", type=float, default=50,
+                        help="queries which take longer than this many milliseconds are counted as lock waits")
+    parser.add_argument("--output", help="path of the JSON results file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup(os.path.join(directory, "load.sqlite3"))
+
+        live_server_case = get_live_server_case()
+        live_server_case.setUpClass()
+        try:
+            results = []
+            print(f"{'shape':<22}{'mode':<12}{'docs/s':>10}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+                  f"{'errors':>8}{'deadlocks':>11}{'lock waits':>12}{'inconsistent':>14}")
+            for shape in args.shapes.split(","):
+                for mode in args.modes.split(","):
+                    result = run_load_test(
+                        live_server_case.live_server_url, shape, mode, args.documents, args.size, args.concurrency,
+                        args.lock_wait_threshold / 1000
+                    )
+                    results.append(result)
+                    print(f"{shape:<22}{mode:<12}{result['documents_per_second']:>10}{result['ops_per_second']:>10}"
+                          f"{result['p50_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}{result['deadlocks']:>11}"
+                          f"{result['lock_waits']:>12}{result['inconsistent']:>14}")
+        finally:
+            live_server_case.tearDownClass()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Runs the benchmarks and stores the results as JSON, so runs can be compared.
+
+.. code-block:: bash
+
+    $ python -m benchmarks.run --sizes 10,100,1000,10000,50000 --output results.json
+    $ python -m benchmarks.run --sizes 10,100,1000 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Dict, List
+
+
+MODES = {
+    "sequential": "/",
+    "bulk": "/bulk",
+    # the same work done as one plain JSON:API request per operation
+    "baseline": None,
+}
+
+JSON_API_CONTENT_TYPE = "application/vnd.api+json"
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    settings.ROOT_URLCONF = "benchmarks.urls"
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(verbosity=0)
+
+
+def resolve_lids(data, lids: Dict):
+    if isinstance(data, list):
+        for item in data:
+            resolve_lids(item, lids)
+    elif isinstance(data, dict):
+        if "lid" in data:
+            data["id"] = lids[(data["type"], data.pop("lid"))]
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                resolve_lids(value, lids)
+
+
+def send_plain_requests(client, operations: List[Dict]) -> int:
+    """Send every operation as plain JSON:API request and return the number of failed requests"""
+    errors = 0
+    lids = {}
+    for operation in operations:
+        primary_data = operation.get("ref") or operation["data"]
+        lid = primary_data.pop("lid", None) if operation["op"] == "add" else None
+        resolve_lids(operation, lids)
+        resource_type = primary_data["type"]
+
+        if operation["op"] == "add":
+            response = client.post(
+                f"/{resource_type}", data=json.dumps({"data": operation["data"]}), content_type=JSON_API_CONTENT_TYPE)
+            if lid and response.status_code == 201:
+                lids[(resource_type, lid)] = json.loads(response.content)["data"]["id"]
+        elif operation["op"] == "remove":
+            response = client.delete(f"/{resource_type}/{primary_data['id']}")
+        elif "ref" in operation:
+            relationship = primary_data["relationship"]
+            data = {
+                "type": resource_type,
+                "id": primary_data["id"],
+                "relationships": {relationship: {"data": operation["data"]}}
+            }
+            response = client.patch(
+                f"/{resource_type}/{primary_data['id']}", data=json.dumps({"data": data}), content_type=JSON_API_CONTENT_TYPE)
+        else:
+            response = client.patch(
+                f"/{resource_type}/{primary_data['id']}", data=json.dumps({"data": operation["data"]}), content_type=JSON_API_CONTENT_TYPE)
+
+        if response.status_code >= 400:
+            errors += 1
+    return errors
+
+
+class QueryCounter:
+    """Counts the executed queries. `CaptureQueriesContext` can not be used, the query log is reset by every request."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def execute(client, mode: str, operations: List[Dict]) -> int:
+    from atomic_operations.consts import ATOMIC_CONTENT_TYPE, ATOMIC_OPERATIONS
+
+    if mode == "baseline":
+        return send_plain_requests(client, operations)
+
+    response = client.post(
+        MODES[mode],
+        data=json.dumps({ATOMIC_OPERATIONS: operations}),
+        content_type=ATOMIC_CONTENT_TYPE,
+        HTTP_ACCEPT=ATOMIC_CONTENT_TYPE
+    )
+    return 0 if response.status_code < 400 else len(operations)
+
+
+def run_benchmark(scenario: str, mode: str, size: int, memory: bool = True) -> Dict:
+    from django.db import connection
+    from django.test import Client
+
+    from benchmarks.documents import SCENARIOS, reset_database, seed_database
+
+    client = Client()
+
+    reset_database()
+    operations = SCENARIOS[scenario](size, seed_database(size))
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        start = perf_counter()
+        errors = execute(client, mode, operations)
+        seconds = perf_counter() - start
+
+    peak_memory = None
+    if memory:
+        # separate run, tracing allocations slows down the execution
+        reset_database()
+        operations = SCENARIOS[scenario](size, seed_database(size))
+        tracemalloc.start()
+        try:
+            execute(client, mode, operations)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "scenario": scenario,
+        "mode": mode,
+        "size": len(operations),
+        "errors": errors,
+        "seconds": round(seconds, 6),
+        "ops_per_second": round(len(operations) / seconds, 2) if seconds else None,
+        "queries": queries.count,
+        "queries_per_operation": round(queries.count / len(operations), 3) if operations else None,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def compare(results: List[Dict], previous: List[Dict]):
+    previous_results = {
+        (result["scenario"], result["mode"], result["size"]): result for result in previous}
+    print(f"{'scenario':<14}{'mode':<12}{'size':>8}{'ops/s':>12}{'previous':>12}{'ratio':>8}")
+    for result in results:
+        before = previous_results.get(
+            (result["scenario"], result["mode"], result["size"]))
+        if not before or not before["ops_per_second"] or not result["ops_per_second"]:
+            continue
+        print(f"{result['scenario']:<14}{result['mode']:<12}{result['size']:>8}{result['ops_per_second']:>12}"
+              f"{before['ops_per_second']:>12}{result['ops_per_second'] / before['ops_per_second']:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000",
+                        help="comma separated numbers of operations per document")
+    parser.add_argument("--scenarios", help="comma separated scenarios, all by default")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the peak memory measurement")
+    parser.add_argument("--output", help="path of the JSON results file")
+    parser.add_argument(
+        "--compare", help="path of a JSON results file of a previous run")
+    args = parser.parse_args(argv)
+
+    setup()
+
+    import django
+
+    from benchmarks.documents import SCENARIOS
+
+    scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+
+    results = []
+    print(f"{'scenario':<14}{'mode':<12}{'size':>8}{'ops/s':>12}{'queries/op':>12}{'peak MiB':>10}{'errors':>8}")
+    for scenario in scenarios:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            for mode in args.modes.split(","):
+                result = run_benchmark(
+                    scenario, mode, size, memory=not args.no_memory)
+                results.append(result)
+                peak = f"{result['peak_memory_bytes'] / 2 ** 20:.1f}" if result["peak_memory_bytes"] is not None else "-"
+                print(f"{scenario:<14}{mode:<12}{result['size']:>8}{result['ops_per_second']:>12}"
+                      f"{result['queries_per_operation']:>12}{peak:>10}{result['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({
+                "created": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "results": results
+            }, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous)["results"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
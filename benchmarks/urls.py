@@ -0,0 +1,16 @@
+from rest_framework.routers import SimpleRouter
+
+from benchmarks.views import (
+    BasicModelViewSet,
+    RelatedModelTwoViewSet,
+    RelatedModelViewSet,
+)
+from tests.urls import urlpatterns as atomic_urlpatterns
+
+
+router = SimpleRouter(trailing_slash=False)
+router.register("BasicModel", BasicModelViewSet)
+router.register("RelatedModel", RelatedModelViewSet)
+router.register("RelatedModelTwo", RelatedModelTwoViewSet)
+
+urlpatterns = atomic_urlpatterns + router.urls
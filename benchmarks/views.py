@@ -0,0 +1,23 @@
+from rest_framework_json_api.views import ModelViewSet
+
+from tests.models import BasicModel, RelatedModel, RelatedModelTwo
+from tests.serializers import (
+    BasicModelSerializer,
+    RelatedModelSerializer,
+    RelatedModelTwoSerializer,
+)
+
+
+class BasicModelViewSet(ModelViewSet):
+    queryset = BasicModel.objects.all()
+    serializer_class = BasicModelSerializer
+
+
+class RelatedModelViewSet(ModelViewSet):
+    queryset = RelatedModel.objects.all()
+    serializer_class = RelatedModelSerializer
+
+
+class RelatedModelTwoViewSet(ModelViewSet):
+    queryset = RelatedModelTwo.objects.all()
+    serializer_class = RelatedModelTwoSerializer
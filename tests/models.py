@@ -32,3 +32,12 @@ class BasicModel(DJAModel):
 
     class Meta:
         ordering = ("id",)
+
+
+class UniqueModel(DJAModel):
+    code = models.CharField(max_length=100, unique=True)
+    text = models.CharField(max_length=100)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("id",)
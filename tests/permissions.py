@@ -0,0 +1,16 @@
+from atomic_operations.permissions import AtomicOperationPermission
+from tests.models import BasicModel
+
+
+class ReadOnlyTextPermission(AtomicOperationPermission):
+    """Denies changes of BasicModel resources which text is `read only`"""
+
+    message = "BasicModel resource is read only."
+
+    def get_denied_operations(self, request, view, operation_code, resource_type, operations):
+        if operation_code == "add" or resource_type != "BasicModel":
+            return []
+        ids = {str(obj["id"]): idx for idx, obj in operations.items() if "id" in obj}
+        read_only = BasicModel.objects.filter(
+            pk__in=ids.keys(), text="read only").values_list("pk", flat=True)
+        return [ids[str(pk)] for pk in read_only]
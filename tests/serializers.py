@@ -1,6 +1,6 @@
 from rest_framework_json_api.serializers import ModelSerializer
 
-from tests.models import BasicModel, RelatedModel, RelatedModelTwo
+from tests.models import BasicModel, RelatedModel, RelatedModelTwo, UniqueModel
 
 
 class BasicModelSerializer(ModelSerializer):
@@ -19,3 +19,20 @@ class RelatedModelTwoSerializer(ModelSerializer):
     class Meta:
         fields = "__all__"
         model = RelatedModelTwo
+
+
+class UniqueModelSerializer(ModelSerializer):
+    class Meta:
+        fields = "__all__"
+        model = UniqueModel
+
+
+class IncludingBasicModelSerializer(ModelSerializer):
+    included_serializers = {
+        "to_one": RelatedModelSerializer,
+        "to_many": RelatedModelTwoSerializer,
+    }
+
+    class Meta:
+        fields = "__all__"
+        model = BasicModel
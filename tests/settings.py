@@ -43,7 +43,11 @@ TEMPLATES = [
 
 
 DATABASES = {"default": {'ENGINE': 'django.db.backends.sqlite3',
-                         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'), }}
+                         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'), },
+             "other": {'ENGINE': 'django.db.backends.sqlite3',
+                       'NAME': os.path.join(BASE_DIR, 'db_other.sqlite3'), }}
+
+DATABASE_ROUTERS = ["atomic_operations.routers.AtomicOperationRouter"]
 
 DEBUG = True
 
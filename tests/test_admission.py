@@ -0,0 +1,66 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from atomic_operations.admission import AdmissionController
+from atomic_operations.exceptions import AdmissionRejected
+
+
+class TestAdmissionController(SimpleTestCase):
+
+    def test_cost_by_weights(self):
+        controller = AdmissionController(max_cost=10, weights={"add:BasicModel": 5, "remove": 3})
+        parsed_operations = [
+            {"add": {"type": "BasicModel"}},
+            {"add": {"type": "RelatedModel"}},
+            {"remove": {"type": "BasicModel", "id": "1"}},
+        ]
+
+        self.assertEqual(9, controller.get_cost(parsed_operations))
+
+    def test_rejected_after_timeout(self):
+        controller = AdmissionController(max_cost=2, timeout=0.01, retry_after=3)
+        controller.acquire(2)
+
+        with self.assertRaises(AdmissionRejected) as context, self.assertLogs("atomic_operations.admission", "WARNING"):
+            controller.acquire(1)
+
+        self.assertEqual(3, context.exception.wait)
+        self.assertEqual(2, controller.in_flight)
+
+    def test_request_above_the_limit_is_admitted_alone(self):
+        controller = AdmissionController(max_cost=2)
+
+        controller.acquire(5)
+
+        self.assertEqual(5, controller.in_flight)
+        with self.assertRaises(AdmissionRejected), self.assertLogs("atomic_operations.admission", "WARNING"):
+            controller.acquire(1)
+
+    def test_waiting_requests_are_admitted_in_order(self):
+        controller = AdmissionController(max_cost=2, timeout=5)
+        controller.acquire(2)
+        admitted = []
+
+        def acquire(name, cost):
+            controller.acquire(cost)
+            admitted.append(name)
+
+        first = threading.Thread(target=acquire, args=("first", 2))
+        first.start()
+        while not controller._waiting:
+            pass
+        second = threading.Thread(target=acquire, args=("second", 1))
+        second.start()
+        while len(controller._waiting) < 2:
+            pass
+
+        controller.release(2)
+        first.join(1)
+        # the second request would fit as well, but waits behind the first one
+        self.assertEqual(["first"], admitted)
+
+        controller.release(2)
+        second.join(1)
+        self.assertEqual(["first", "second"], admitted)
+        self.assertEqual(1, controller.in_flight)
@@ -0,0 +1,33 @@
+from django.test import LiveServerTestCase, TestCase, override_settings
+
+from benchmarks.documents import SCENARIOS
+from benchmarks.load import SHAPES, run_load_test
+from benchmarks.run import MODES, run_benchmark
+
+
+@override_settings(ROOT_URLCONF="benchmarks.urls")
+class TestBenchmarks(TestCase):
+
+    def test_all_scenarios_succeed(self):
+        for scenario in SCENARIOS:
+            for mode in MODES:
+                with self.subTest(scenario=scenario, mode=mode):
+                    result = run_benchmark(scenario, mode, 4, memory=False)
+
+                    self.assertEqual(0, result["errors"])
+                    self.assertEqual(4, result["size"])
+                    self.assertGreater(result["queries"], 0)
+
+
+@override_settings(ROOT_URLCONF="benchmarks.urls")
+class TestLoadTest(LiveServerTestCase):
+
+    def test_all_shapes_succeed(self):
+        for shape in SHAPES:
+            for mode in ["sequential", "bulk"]:
+                with self.subTest(shape=shape, mode=mode):
+                    result = run_load_test(self.live_server_url, shape, mode, documents=4, size=4, concurrency=1)
+
+                    self.assertEqual(0, result["errors"])
+                    self.assertEqual(0, result["inconsistent"])
+                    self.assertIsNotNone(result["p99_ms"])
@@ -425,6 +425,74 @@ class TestAtomicOperationParser(TestCase):
         ]
         self.assertEqual(expected_result, result)
 
+    def test_lid_references(self):
+        data = {
+            ATOMIC_OPERATIONS: [
+                {
+                    "op": "add",
+                    "data": {
+                        "lid": "1",
+                        "type": "articles",
+                        "attributes": {
+                            "title": "JSON API paints my bikeshed!",
+                            "blob": {"lid": "not-a-reference", "type": "articles"}
+                        },
+                        "relationships": {
+                            "author": {
+                                "data": {"lid": "2", "type": "people"}
+                            },
+                            "tags": {
+                                "data": [{"id": "1", "type": "tags"}, {"lid": "3", "type": "tags"}]
+                            }
+                        }
+                    }
+                },
+                {
+                    "op": "update",
+                    "ref": {
+                        "id": "1",
+                        "type": "articles",
+                        "relationship": "tags"
+                    },
+                    "data": [{"lid": "3", "type": "tags"}]
+                },
+                {
+                    "op": "update",
+                    "data": {
+                        "id": "1",
+                        "type": "articles",
+                        "attributes": {
+                            "title": "JSON API supports lids!"
+                        }
+                    }
+                }
+            ]
+        }
+        stream = BytesIO(json.dumps(data).encode("utf-8"))
+
+        result = self.parser.parse(stream, parser_context=self.parser_context)
+
+        self.assertEqual(
+            {
+                0: [
+                    ({"lid": "1", "type": "articles"}, "data/lid"),
+                    ({"lid": "2", "type": "people"}, "data/relationships/author/data/lid"),
+                    ({"lid": "3", "type": "tags"}, "data/relationships/tags/data/1/lid"),
+                ],
+                1: [
+                    ({"lid": "3", "type": "tags"}, "data/0/lid"),
+                ]
+            },
+            {
+                idx: [
+                    ({key: identifier[key] for key in ["lid", "type"]}, pointer) for identifier, pointer in references
+                ] for idx, references in result.lid_references.items()
+            }
+        )
+        self.assertIs(result[0]["add"], result.lid_references[0][0].identifier)
+        self.assertIs(result[0]["add"]["author"], result.lid_references[0][1].identifier)
+        self.assertIs(result[1]["update-relationship"]["tags"][0], result.lid_references[1][0].identifier)
+
     def test_primary_data_with_id_and_lid(self):
         data = {
             ATOMIC_OPERATIONS: [
@@ -0,0 +1,65 @@
+import json
+
+from django.test import RequestFactory, TestCase
+
+from atomic_operations.consts import ATOMIC_RESULTS
+from atomic_operations.renderers import AtomicResultRenderer
+from tests.models import RelatedModel
+from tests.serializers import RelatedModelSerializer
+from tests.views import ConcretAtomicOperationView
+
+
+class TestAtomicResultRenderer(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.renderer = AtomicResultRenderer()
+        self.view = ConcretAtomicOperationView()
+        self.view.response_meta = {}
+        self.renderer_context = {"request": self.factory.post("/"), "view": self.view}
+        self.maxDiff = None
+
+    def test_render_results(self):
+        results = [
+            RelatedModelSerializer(instance=RelatedModel.objects.create(text=f"JSON API paints my bikeshed {idx}!")).data
+            for idx in range(2)
+        ]
+        self.view.response_meta = {"count": 2}
+
+        rendered_content = self.renderer.render(results, renderer_context=self.renderer_context)
+
+        self.assertEqual(
+            {
+                ATOMIC_RESULTS: [
+                    {
+                        "data": {
+                            "id": "1",
+                            "type": "RelatedModel",
+                            "attributes": {
+                                "text": "JSON API paints my bikeshed 0!"
+                            }
+                        }
+                    }, {
+                        "data": {
+                            "id": "2",
+                            "type": "RelatedModel",
+                            "attributes": {
+                                "text": "JSON API paints my bikeshed 1!"
+                            }
+                        }
+                    }
+                ],
+                "meta": {"count": 2}
+            },
+            json.loads(rendered_content)
+        )
+
+    def test_render_errors(self):
+        errors = [
+            {"detail": "first error", "status": "400"},
+            {"detail": "second error", "status": "400"},
+        ]
+
+        rendered_content = self.renderer.render(errors, renderer_context=self.renderer_context)
+
+        self.assertEqual({"errors": errors}, json.loads(rendered_content))
@@ -1,15 +1,60 @@
 import json
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import Future
+from datetime import timedelta
+from contextvars import copy_context
+from unittest import mock
 
 from django import VERSION
-from django.test import Client, RequestFactory, TestCase
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.db.models.signals import pre_delete
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from atomic_operations.consts import (
     ATOMIC_CONTENT_TYPE,
     ATOMIC_OPERATIONS,
     ATOMIC_RESULTS,
 )
-from tests.models import BasicModel, RelatedModel, RelatedModelTwo
-from tests.views import ConcretAtomicOperationView
+from atomic_operations.group_commit import GroupCommitExecutor
+from atomic_operations.jobs import InMemoryJobStore, Job
+from atomic_operations.memory import MemoryProfiler
+from tests.models import BasicModel, RelatedModel, RelatedModelTwo, UniqueModel
+from tests.serializers import BasicModelSerializer
+from tests.views import (
+    AdmissionControlledAtomicOperationView,
+    BulkDryRunAtomicOperationView,
+    BulkUpsertAtomicOperationView,
+    ConcretAtomicOperationView,
+    DetectFastRemoveAtomicOperationView,
+    DryRunAtomicOperationView,
+    JobAtomicOperationView,
+    MultiDatabaseAtomicOperationView,
+    ThreadJobAtomicOperationView,
+    ParallelValidatingAtomicOperationView,
+    PrevalidatingAtomicOperationView,
+    ProfilingAtomicOperationView,
+    StreamingAtomicOperationView,
+    TracingAtomicOperationView,
+    UpsertAtomicOperationView,
+    BulkTracingAtomicOperationView,
+)
 
 
 class TestAtomicOperationView(TestCase):
@@ -808,6 +853,42 @@ class TestAtomicOperationView(TestCase):
         self.assertEqual(422, response.status_code)
         self.assertDictEqual(expected_error, error)
 
+    def test_view_processing_with_unknown_relationship_lid(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    },
+                    "relationships": {
+                        "to_many": {
+                            "data": [{"type": "RelatedModelTwo", "lid": "unknown"}]
+                        }
+                    }
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        error = json.loads(response.content)
+        self.assertEqual(422, response.status_code)
+        self.assertEqual(
+            f"/{ATOMIC_OPERATIONS}/0/data/relationships/to_many/data/0/lid", error["errors"][0]["source"]["pointer"])
+        self.assertEqual(0, BasicModel.objects.count())
+
     def test_adding_resource_with_lid_relationship(self):
         operations = [
             {
@@ -947,3 +1028,2450 @@ class TestAtomicOperationView(TestCase):
 
         self.assertDictEqual(expected_result,
                              json.loads(response.content))
+
+    def test_validation_error_with_operation_pointer(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!" * 10
+                    }
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        error = json.loads(response.content)
+        expected_error = {
+            "errors": [
+                {
+                    "detail": "Ensure this field has no more than 100 characters.",
+                    "source": {
+                        "pointer": f"/{ATOMIC_OPERATIONS}/1/data/attributes/text"
+                    },
+                    "status": "400",
+                    "code": "max_length"
+                }
+            ]
+        }
+        self.assertEqual(400, response.status_code)
+        self.assertDictEqual(expected_error, error)
+        self.assertEqual(0, BasicModel.objects.count())
+
+    def test_independent_operations(self):
+        operations = [
+            {"add": {"type": "RelatedModel", "lid": "lid-1", "text": "1"}},
+            {"add": {"type": "BasicModel", "text": "2"}},
+            {"add": {"type": "BasicModel", "text": "3", "to_one": {"type": "RelatedModel", "id": "1"}}},
+            {"add": {"type": "BasicModel", "text": "4", "to_many": [{"type": "RelatedModelTwo", "id": "1"}]}},
+            {"update": {"type": "BasicModel", "id": "1", "text": "5"}},
+            {"update": {"type": "RelatedModelTwo", "id": "1", "text": "6"}},
+            {"update": {"type": "RelatedModelTwo", "id": "1", "text": "7"}},
+            {"update": {"type": "RelatedModelTwo", "lid": "lid-2", "text": "8"}},
+            {"remove": {"type": "RelatedModelTwo", "id": "2"}},
+            {"add": {"type": "BasicModel", "text": "9", "to_many": [{"type": "RelatedModelTwo", "id": "3"}]}},
+            # the remove could cascade to any resource
+            {"update": {"type": "BasicModel", "id": "2", "text": "10"}},
+            {"add": {"type": "BasicModel", "text": "11"}},
+        ]
+
+        self.assertSetEqual(
+            {0, 1, 3, 5, 8, 11},
+            PrevalidatingAtomicOperationView().get_independent_operations(operations)
+        )
+
+    def test_prevalidation_outside_of_transaction(self):
+        RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "lid": "prevalidation-lid-1",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    },
+                    "relationships": {
+                        "to_one": {
+                            "data": {"type": "RelatedModel", "id": "1"}
+                        }
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "type": "BasicModel",
+                    "lid": "prevalidation-lid-1",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        atomic_block_depths = []
+        validate_operation = PrevalidatingAtomicOperationView.validate_operation
+
+        def record_depth(view, *args, **kwargs):
+            atomic_block_depths.append(len(connection.atomic_blocks))
+            return validate_operation(view, *args, **kwargs)
+
+        with mock.patch.object(PrevalidatingAtomicOperationView, "validate_operation", autospec=True, side_effect=record_depth):
+            response = self.client.post(
+                path="/prevalidate",
+                data=data,
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        # the independent add operation is validated outside, the lid dependent update inside the transaction
+        self.assertEqual(atomic_block_depths[0] + 1, atomic_block_depths[1])
+        self.assertEqual("JSON API paints my bikeshed2!",
+                         BasicModel.objects.get(to_one__pk=1).text)
+
+    def test_prevalidation_with_valid_request(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    },
+                    "relationships": {
+                        "to_one": {
+                            "data": {"type": "RelatedModel", "id": "1"}
+                        }
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": "1",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }, {
+                "op": "remove",
+                "ref": {
+                    "id": "1",
+                    "type": "BasicModel",
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/prevalidate",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(json.loads(response.content)[ATOMIC_RESULTS]))
+        self.assertEqual(0, BasicModel.objects.count())
+        self.assertEqual(1, RelatedModel.objects.count())
+
+    def get_unique_model_operations(self, changes):
+        operations = []
+        for pk, code in changes:
+            operation = {
+                "op": "update" if pk else "add",
+                "data": {
+                    "type": "UniqueModel",
+                    "attributes": {
+                        "code": code,
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+            if pk:
+                operation["data"]["id"] = str(pk)
+            operations.append(operation)
+        return operations
+
+    def assert_unique_fields_are_validated_in_order(self, paths):
+        for path in paths:
+            obj = UniqueModel.objects.create(code=f"{path}x", text="JSON API paints my bikeshed!")
+
+            # the add reuses the code which is released by the earlier update
+            response = self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: self.get_unique_model_operations([(obj.pk, f"{path}y"), (None, f"{path}x")])},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+            self.assertEqual(200, response.status_code, path)
+            self.assertEqual(
+                [f"{path}x", f"{path}y"], sorted(UniqueModel.objects.filter(code__startswith=path).values_list("code", flat=True)))
+
+            response = self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: self.get_unique_model_operations([(None, f"{path}z"), (None, f"{path}z")])},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+            self.assertEqual(400, response.status_code, path)
+            self.assertEqual(
+                f"/{ATOMIC_OPERATIONS}/1/data/attributes/code",
+                json.loads(response.content)["errors"][0]["source"]["pointer"]
+            )
+            self.assertFalse(UniqueModel.objects.filter(code=f"{path}z").exists(), path)
+
+    def test_prevalidation_after_cascading_remove(self):
+        related = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        obj = BasicModel.objects.create(text="JSON API paints my bikeshed!", to_one=related)
+        operations = [
+            {
+                "op": "remove",
+                "ref": {
+                    "id": str(related.pk),
+                    "type": "RelatedModel"
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": str(obj.pk),
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }
+        ]
+
+        for path in ["/", "/prevalidate"]:
+            response = self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+            # the remove cascades to the updated resource
+            self.assertEqual(422, response.status_code, path)
+            error = json.loads(response.content)["errors"][0]
+            self.assertEqual(
+                ("object-does-not-exist", f"/{ATOMIC_OPERATIONS}/1/data/id"), (error["id"], error["source"]["pointer"]))
+            self.assertTrue(BasicModel.objects.filter(pk=obj.pk).exists(), path)
+
+    def test_prevalidation_of_unique_fields(self):
+        self.assert_unique_fields_are_validated_in_order(["/", "/prevalidate"])
+
+    def test_parallel_validation(self):
+        RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": f"JSON API paints my bikeshed {idx}!"
+                    },
+                    "relationships": {
+                        "to_one": {
+                            "data": {"type": "RelatedModel", "id": "1"}
+                        }
+                    }
+                }
+            } for idx in range(6)
+        ]
+
+        validating_threads = set()
+        validate_operation = ParallelValidatingAtomicOperationView.validate_operation
+
+        def record_thread(view, *args, **kwargs):
+            validating_threads.add(threading.get_ident())
+            return validate_operation(view, *args, **kwargs)
+
+        with mock.patch.object(ParallelValidatingAtomicOperationView, "validate_operation", autospec=True, side_effect=record_thread):
+            response = self.client.post(
+                path="/parallel-validation",
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn(threading.get_ident(), validating_threads)
+        # the writes are performed in order of the operations
+        self.assertEqual(
+            [f"JSON API paints my bikeshed {idx}!" for idx in range(6)],
+            [result["data"]["attributes"]["text"] for result in json.loads(response.content)[ATOMIC_RESULTS]]
+        )
+        self.assertEqual(6, BasicModel.objects.filter(to_one__pk=1).count())
+
+    def test_parallel_validation_reports_lowest_failing_operation(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!" * (10 if idx in [1, 3] else 1)
+                    }
+                }
+            } for idx in range(4)
+        ]
+
+        validate_operation = ParallelValidatingAtomicOperationView.validate_operation
+
+        def delay_first_failure(view, idx, *args, **kwargs):
+            # the later failing operation finishes first
+            if idx == 1:
+                time.sleep(0.05)
+            return validate_operation(view, idx, *args, **kwargs)
+
+        with mock.patch.object(ParallelValidatingAtomicOperationView, "validate_operation", autospec=True, side_effect=delay_first_failure):
+            response = self.client.post(
+                path="/parallel-validation",
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(
+            [f"/{ATOMIC_OPERATIONS}/1/data/attributes/text"],
+            [error["source"]["pointer"] for error in json.loads(response.content)["errors"]]
+        )
+        self.assertEqual(0, BasicModel.objects.count())
+
+    def test_admission_control(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(2)
+        ]
+
+        def post():
+            return self.client.post(
+                path="/admission",
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        controller = AdmissionControlledAtomicOperationView.admission_controller
+        # another request is in flight
+        controller.acquire(3)
+        try:
+            with self.assertLogs("atomic_operations.admission", "WARNING"):
+                response = post()
+        finally:
+            controller.release(3)
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual("5", response["Retry-After"])
+        self.assertEqual("service-unavailable", json.loads(response.content)["errors"][0]["id"])
+        self.assertEqual(0, BasicModel.objects.count())
+
+        response = post()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(0, controller.in_flight)
+
+    def test_dry_run_plan_of_bulk_mode(self):
+        BasicModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(2)
+        ] + [
+            {
+                "op": "update",
+                "data": {
+                    "id": "1",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }, {
+                "op": "remove",
+                "ref": {
+                    "id": "1",
+                    "type": "BasicModel"
+                }
+            }
+        ]
+
+        response = self.client.post(
+            path="/bulk/dry-run?dryRun=true",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        document = json.loads(response.content)
+        self.assertEqual(3, len(document[ATOMIC_RESULTS]))
+        plan = document["meta"]["plan"]
+        self.assertEqual("bulk", plan["mode"])
+        self.assertEqual(
+            [
+                ("add", "perform_bulk_create", [0, 1]),
+                ("update", "handle_sequential", [2]),
+                ("remove", "perform_bulk_delete", [3]),
+            ],
+            [(batch["op"], batch["strategy"], batch["operations"]) for batch in plan["batches"]]
+        )
+        self.assertTrue(any(sql.startswith("INSERT") for sql in plan["batches"][0]["sql"]))
+        self.assertTrue(any(sql.startswith("DELETE") for sql in plan["batches"][2]["sql"]))
+        self.assertIn("queries", document["meta"])
+        # all operations are rolled back
+        self.assertEqual(["JSON API paints my bikeshed!"], list(BasicModel.objects.values_list("text", flat=True)))
+
+    def test_dry_run_plan_reports_write_strategies(self):
+        obj = BasicModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "UniqueModel",
+                    "attributes": {
+                        "code": "new",
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": str(obj.pk),
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }, {
+                "op": "remove",
+                "ref": {
+                    "id": str(obj.pk),
+                    "type": "BasicModel"
+                }
+            }
+        ]
+
+        for path, view in [("/dry-run", DryRunAtomicOperationView), ("/bulk/dry-run", BulkDryRunAtomicOperationView)]:
+            with mock.patch.object(view, "upsert_fields", {"UniqueModel": ["code"]}), \
+                    mock.patch.object(view, "blind_update_types", ["BasicModel"]), \
+                    mock.patch.object(view, "fast_remove_types", ["BasicModel"]):
+                response = self.client.post(
+                    path=f"{path}?dryRun=true",
+                    data={ATOMIC_OPERATIONS: operations},
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+                )
+
+            self.assertEqual(200, response.status_code, path)
+            self.assertEqual(
+                ["perform_upsert", "perform_blind_updates", "perform_fast_remove"],
+                [batch["strategy"] for batch in json.loads(response.content)["meta"]["plan"]["batches"]],
+                path
+            )
+
+    def test_dry_run_by_header(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(2)
+        ]
+
+        def post(path, **headers):
+            return self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, **headers}
+            )
+
+        response = post("/dry-run", HTTP_X_ATOMIC_DRY_RUN="1")
+
+        self.assertEqual(200, response.status_code)
+        plan = json.loads(response.content)["meta"]["plan"]
+        self.assertEqual("sequential", plan["mode"])
+        self.assertEqual([[0], [1]], [batch["operations"] for batch in plan["batches"]])
+        self.assertEqual(0, BasicModel.objects.count())
+
+        # views which do not allow dry runs ignore the header
+        response = post("/", HTTP_X_ATOMIC_DRY_RUN="1")
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn("meta", json.loads(response.content))
+        self.assertEqual(2, BasicModel.objects.count())
+
+    def get_upsert_operations(self):
+        return [
+            {
+                "op": "add",
+                "data": {
+                    "type": "UniqueModel",
+                    "lid": "existing",
+                    "attributes": {
+                        "code": "existing",
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "UniqueModel",
+                    "lid": "new",
+                    "attributes": {
+                        "code": "new",
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "type": "UniqueModel",
+                    "lid": "existing",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }
+        ]
+
+    def test_upsert(self):
+        existing = UniqueModel.objects.create(code="existing", text="outdated")
+        outdated = timezone.now() - timedelta(days=1)
+
+        for path in ["/upsert", "/bulk/upsert"]:
+            UniqueModel.objects.filter(pk=existing.pk).update(modified=outdated)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    path=path,
+                    data={ATOMIC_OPERATIONS: self.get_upsert_operations()},
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+                )
+
+            self.assertEqual(200, response.status_code, path)
+            results = json.loads(response.content)[ATOMIC_RESULTS]
+            new = UniqueModel.objects.get(code="new")
+            # the ids of updated and inserted rows are returned and registered for their lids
+            self.assertEqual(
+                [
+                    (str(existing.pk), "JSON API paints my bikeshed!"),
+                    (str(new.pk), "JSON API paints my bikeshed!"),
+                    (str(existing.pk), "JSON API paints my bikeshed2!"),
+                ],
+                [(result["data"]["id"], result["data"]["attributes"]["text"]) for result in results]
+            )
+            self.assertEqual(2, UniqueModel.objects.count())
+            # the `auto_now` fields of updated rows are set as well
+            self.assertGreater(parse_datetime(results[0]["data"]["attributes"]["modified"]), outdated, path)
+            self.assertGreater(UniqueModel.objects.get(pk=existing.pk).modified, outdated, path)
+            inserts = [query for query in queries.captured_queries if query["sql"].startswith('INSERT INTO "tests_uniquemodel"')]
+            self.assertEqual(2 if path == "/upsert" else 1, len(inserts), path)
+
+    def test_upsert_with_same_unique_values(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "UniqueModel",
+                    "attributes": {
+                        "code": "same",
+                        "text": f"JSON API paints my bikeshed {idx}!"
+                    }
+                }
+            } for idx in range(2)
+        ]
+
+        response = self.client.post(
+            path="/bulk/upsert",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("JSON API paints my bikeshed 1!", UniqueModel.objects.get(code="same").text)
+
+    def test_add_without_upsert_validates_unique_fields(self):
+        UniqueModel.objects.create(code="existing", text="outdated")
+
+        response = self.client.post(
+            path="/",
+            data={ATOMIC_OPERATIONS: self.get_upsert_operations()[:1]},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(
+            f"/{ATOMIC_OPERATIONS}/0/data/attributes/code",
+            json.loads(response.content)["errors"][0]["source"]["pointer"]
+        )
+
+    def test_upsert_of_many_to_many_relationship(self):
+        related = RelatedModelTwo.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    },
+                    "relationships": {
+                        "to_many": {
+                            "data": [{"type": "RelatedModelTwo", "id": str(related.pk)}]
+                        }
+                    }
+                }
+            }
+        ]
+
+        for path, view in [("/upsert", UpsertAtomicOperationView), ("/bulk/upsert", BulkUpsertAtomicOperationView)]:
+            with mock.patch.object(view, "upsert_fields", {"BasicModel": ["text"]}):
+                response = self.client.post(
+                    path=path,
+                    data={ATOMIC_OPERATIONS: operations},
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+                )
+
+            self.assertEqual(400, response.status_code, path)
+            error = json.loads(response.content)["errors"][0]
+            self.assertEqual(
+                ("many-to-many-upsert", f"/{ATOMIC_OPERATIONS}/0/data/relationships/to_many"),
+                (error["id"], error["source"]["pointer"])
+            )
+            self.assertFalse(BasicModel.objects.exists(), path)
+
+    def test_upsert_requires_django_4_1(self):
+        with mock.patch("atomic_operations.views.DJANGO_VERSION", (4, 0, 0, "final", 0)):
+            with self.assertRaises(ImproperlyConfigured):
+                UpsertAtomicOperationView.as_view()
+            ConcretAtomicOperationView.as_view()
+
+    def get_remove_operations(self, ids):
+        return [
+            {
+                "op": "remove",
+                "ref": {
+                    "id": str(pk),
+                    "type": "BasicModel"
+                }
+            } for pk in ids
+        ]
+
+    def test_fast_remove(self):
+        related = RelatedModelTwo.objects.create(text="JSON API paints my bikeshed!")
+        objs = [BasicModel.objects.create(text="JSON API paints my bikeshed!") for _ in range(3)]
+        for obj in objs:
+            obj.to_many.add(related)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path="/bulk/fast-remove",
+                data={ATOMIC_OPERATIONS: self.get_remove_operations([objs[0].pk, objs[1].pk])},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(204, response.status_code)
+        self.assertEqual([objs[2].pk], list(BasicModel.objects.values_list("pk", flat=True)))
+        self.assertEqual(1, BasicModel.to_many.through.objects.count())
+        # the removed resources are not loaded
+        self.assertFalse(any(
+            query["sql"].startswith("SELECT") and '"tests_basicmodel"' in query["sql"] for query in queries.captured_queries))
+        self.assertEqual(2, len([query for query in queries.captured_queries if query["sql"].startswith("DELETE")]))
+
+    def test_fast_remove_of_unknown_resource(self):
+        obj = BasicModel.objects.create(text="JSON API paints my bikeshed!")
+
+        for path in ["/fast-remove", "/bulk/fast-remove"]:
+            response = self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: self.get_remove_operations([obj.pk, 99])},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+            self.assertEqual(422, response.status_code, path)
+            errors = json.loads(response.content)["errors"]
+            self.assertEqual(
+                [("object-does-not-exist", f"/{ATOMIC_OPERATIONS}/1/data/id")],
+                [(error["id"], error["source"]["pointer"]) for error in errors]
+            )
+            self.assertTrue(BasicModel.objects.filter(pk=obj.pk).exists(), path)
+
+    def test_detect_fast_remove(self):
+        objs = [BasicModel.objects.create(text="JSON API paints my bikeshed!") for _ in range(4)]
+        objs[0].to_many.add(RelatedModelTwo.objects.create(text="JSON API paints my bikeshed!"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path="/bulk/detect-fast-remove",
+                data={ATOMIC_OPERATIONS: self.get_remove_operations([obj.pk for obj in objs[:3]])},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(204, response.status_code)
+        self.assertEqual([objs[3].pk], list(BasicModel.objects.values_list("pk", flat=True)))
+        self.assertEqual(0, BasicModel.to_many.through.objects.count())
+        self.assertFalse(any(
+            query["sql"].startswith("SELECT") and '"tests_basicmodel"' in query["sql"] for query in queries.captured_queries))
+        # two chunks, each deletes the rows of the many to many table and of the model
+        self.assertEqual(4, len([query for query in queries.captured_queries if query["sql"].startswith("DELETE")]))
+
+    def test_detect_fast_remove_falls_back_to_collector(self):
+        view = DetectFastRemoveAtomicOperationView()
+        self.assertTrue(view.is_fast_removable(BasicModel))
+        # the foreign key of BasicModel needs to be cascaded by django
+        self.assertFalse(view.is_fast_removable(RelatedModel))
+
+        def receiver(sender, instance, **kwargs):
+            pass
+
+        pre_delete.connect(receiver, sender=BasicModel)
+        try:
+            self.assertFalse(view.is_fast_removable(BasicModel))
+        finally:
+            pre_delete.disconnect(receiver, sender=BasicModel)
+
+        related = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        BasicModel.objects.create(text="JSON API paints my bikeshed!", to_one=related)
+        response = self.client.post(
+            path="/bulk/detect-fast-remove",
+            data={ATOMIC_OPERATIONS: [{"op": "remove", "ref": {"id": str(related.pk), "type": "RelatedModel"}}]},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(204, response.status_code)
+        self.assertFalse(BasicModel.objects.exists())
+
+    def get_update_operations(self, changes):
+        return [
+            {
+                "op": "update",
+                "data": {
+                    "id": str(pk),
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": text
+                    }
+                }
+            } for pk, text in changes
+        ]
+
+    def test_blind_update(self):
+        objs = [BasicModel.objects.create(text="JSON API paints my bikeshed!") for _ in range(3)]
+        changes = [(objs[0].pk, "green"), (objs[1].pk, "green"), (objs[2].pk, "red"), (objs[0].pk, "blue")]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path="/bulk/blind-update",
+                data={ATOMIC_OPERATIONS: self.get_update_operations(changes)},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ["blue", "green", "red"], list(BasicModel.objects.values_list("text", flat=True)))
+        # every result shows the state after its own operation
+        self.assertEqual(
+            ["green", "green", "red", "blue"],
+            [result["data"]["attributes"]["text"] for result in json.loads(response.content)[ATOMIC_RESULTS]]
+        )
+        sql = [query["sql"] for query in queries.captured_queries]
+        # equal changes share one UPDATE, the second change of the first resource needs its own
+        self.assertEqual(3, len([query for query in sql if query.startswith("UPDATE")]))
+        # the instances are only loaded to serialize the results
+        first_update = next(position for position, query in enumerate(sql) if query.startswith("UPDATE"))
+        self.assertFalse(any(
+            query.startswith("SELECT") and '"tests_basicmodel"' in query for query in sql[:first_update]))
+
+    def test_blind_update_groups_changes_of_auto_now_fields(self):
+        objs = [UniqueModel.objects.create(code=f"code-{idx}", text="open") for idx in range(5)]
+        operations = [
+            {
+                "op": "update",
+                "data": {
+                    "id": str(obj.pk),
+                    "type": "UniqueModel",
+                    "attributes": {
+                        "text": "closed"
+                    }
+                }
+            } for obj in objs
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path="/bulk/blind-update",
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len([query for query in queries.captured_queries if query["sql"].startswith("UPDATE")]))
+        self.assertEqual(
+            [("closed", True)] * 5,
+            [(obj.text, obj.modified > objs[0].modified) for obj in UniqueModel.objects.all()]
+        )
+
+    def test_blind_update_with_unchanged_unique_field(self):
+        obj = UniqueModel.objects.create(code="same", text="open")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path="/blind-update",
+                data={ATOMIC_OPERATIONS: [{
+                    "op": "update",
+                    "data": {
+                        "id": str(obj.pk),
+                        "type": "UniqueModel",
+                        "attributes": {
+                            "code": "same",
+                            "text": "closed"
+                        }
+                    }
+                }]},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("closed", UniqueModel.objects.get(pk=obj.pk).text)
+        # only the savepoint of the document, the update itself needs none
+        self.assertEqual(1, len([query for query in queries.captured_queries if query["sql"].startswith("SAVEPOINT")]))
+
+    def test_blind_update_of_unknown_resource(self):
+        obj = BasicModel.objects.create(text="JSON API paints my bikeshed!")
+
+        for path in ["/blind-update", "/bulk/blind-update"]:
+            response = self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: self.get_update_operations([(obj.pk, "green"), (99, "green")])},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+            self.assertEqual(422, response.status_code, path)
+            errors = json.loads(response.content)["errors"]
+            self.assertEqual(
+                [("object-does-not-exist", f"/{ATOMIC_OPERATIONS}/1/data/id")],
+                [(error["id"], error["source"]["pointer"]) for error in errors]
+            )
+            self.assertEqual("JSON API paints my bikeshed!", BasicModel.objects.get(pk=obj.pk).text, path)
+
+    def test_blind_update_of_many_to_many_relationship_loads_the_instance(self):
+        obj = BasicModel.objects.create(text="JSON API paints my bikeshed!")
+        related = RelatedModelTwo.objects.create(text="JSON API paints my bikeshed!")
+
+        for path in ["/blind-update", "/bulk/blind-update"]:
+            response = self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: [{
+                    "op": "update",
+                    "ref": {
+                        "id": str(obj.pk),
+                        "type": "BasicModel",
+                        "relationship": "to_many"
+                    },
+                    "data": [{"type": "RelatedModelTwo", "id": str(related.pk)}]
+                }]},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+            self.assertEqual(204, response.status_code, path)
+            self.assertEqual([related], list(obj.to_many.all()), path)
+            obj.to_many.clear()
+
+    def test_related_resources_are_prefetched(self):
+        RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    },
+                    "relationships": {
+                        "to_one": {
+                            "data": {"type": "RelatedModel", "id": f"{idx % 2 + 1}"}
+                        }
+                    }
+                }
+            } for idx in range(10)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path="/",
+                data=data,
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        related_lookups = [query for query in queries.captured_queries if query["sql"].startswith(
+            "SELECT") and 'FROM "tests_relatedmodel"' in query["sql"]]
+        self.assertEqual(1, len(related_lookups))
+        self.assertEqual(5, BasicModel.objects.filter(to_one__pk=2).count())
+
+    def test_related_resources_updated_by_earlier_operations_are_not_prefetched(self):
+        first = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        second = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {"add": {"type": "BasicModel", "text": "1", "to_one": {"type": "RelatedModel", "id": str(first.pk)}}},
+            {"add": {"type": "BasicModel", "text": "2", "to_one": {"type": "RelatedModel", "id": str(second.pk)}}},
+            {"update": {"type": "RelatedModel", "id": str(first.pk), "text": "3"}},
+            # the first resource could be changed by the update, the second one is only referenced before it
+            {"add": {"type": "BasicModel", "text": "4", "to_one": {"type": "RelatedModel", "id": str(first.pk)}}},
+        ]
+
+        view = ConcretAtomicOperationView()
+        view.request = view.initialize_request(self.factory.post("/"))
+        view.format_kwarg = None
+        view.related_instances = {}
+        view.prefetch_related_instances(operations)
+
+        self.assertEqual([str(second.pk)], list(view.related_instances[(BasicModelSerializer, "to_one")]))
+
+    def test_unknown_related_resource_with_operation_pointer(self):
+        RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    },
+                    "relationships": {
+                        "to_one": {
+                            "data": {"type": "RelatedModel", "id": f"{idx}"}
+                        }
+                    }
+                }
+            } for idx in range(1, 3)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        error = json.loads(response.content)
+        expected_error = {
+            "errors": [
+                {
+                    "detail": 'Invalid pk "2" - object does not exist.',
+                    "source": {
+                        "pointer": f"/{ATOMIC_OPERATIONS}/1/data/relationships/to_one"
+                    },
+                    "status": "400",
+                    "code": "does_not_exist"
+                }
+            ]
+        }
+        self.assertEqual(400, response.status_code)
+        self.assertDictEqual(expected_error, error)
+        self.assertEqual(0, BasicModel.objects.count())
+
+    def test_operation_permissions_are_checked_per_group(self):
+        BasicModel.objects.create(text="JSON API paints my bikeshed!")
+        BasicModel.objects.create(text="read only")
+        BasicModel.objects.create(text="read only")
+
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": "1",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": "2",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }, {
+                "op": "remove",
+                "ref": {
+                    "id": "3",
+                    "type": "BasicModel",
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path="/permissions",
+                data=data,
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        error = json.loads(response.content)
+        expected_error = {
+            "errors": [
+                {
+                    "id": "permission-denied",
+                    "detail": "BasicModel resource is read only.",
+                    "source": {
+                        "pointer": f"/{ATOMIC_OPERATIONS}/2"
+                    },
+                    "status": "403"
+                }, {
+                    "id": "permission-denied",
+                    "detail": "BasicModel resource is read only.",
+                    "source": {
+                        "pointer": f"/{ATOMIC_OPERATIONS}/3"
+                    },
+                    "status": "403"
+                }
+            ]
+        }
+        self.assertEqual(403, response.status_code)
+        self.assertDictEqual(expected_error, error)
+        # one query for the update group and one for the remove group
+        self.assertEqual(2, len(queries.captured_queries))
+        self.assertEqual(3, BasicModel.objects.count())
+
+    def test_phase_timings(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": "1",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        with self.assertLogs("atomic_operations.timing", level="DEBUG") as logs:
+            response = self.client.post(
+                path="/timing",
+                data=data,
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        phases = [metric.split(";")[0]
+                  for metric in response["Server-Timing"].split(", ")]
+        self.assertListEqual(
+            ["parse", "permissions", "prefetch", "lids", "validate", "write", "render"], phases)
+        self.assertIn(
+            "phase=validate operation=update type=BasicModel count=1", "\n".join(logs.output))
+
+    def test_phase_timings_are_disabled_by_default(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_query_accounting_per_operation(self):
+        BasicModel.objects.bulk_create([BasicModel(text="JSON API paints my bikeshed!") for _ in range(5)])
+        operations = [
+            {
+                "op": "update",
+                "data": {
+                    "id": str(pk),
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            } for pk in BasicModel.objects.values_list("pk", flat=True)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        with self.assertLogs("atomic_operations.queries", level="WARNING") as logs:
+            response = self.client.post(
+                path="/debug-queries",
+                data=data,
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        queries = json.loads(response.content)["meta"]["queries"]
+        self.assertListEqual(
+            [(idx, "update", "BasicModel") for idx in range(5)],
+            [(operation["index"], operation["op"], operation["type"])
+             for operation in queries["operations"]]
+        )
+        self.assertTrue(
+            all(operation["count"] > 0 for operation in queries["operations"]))
+        # every updated resource is fetched by its own query
+        self.assertEqual(1, len(queries["n_plus_one"]))
+        self.assertEqual(5, queries["n_plus_one"][0]["operations"])
+        self.assertIn("possible N+1 query issued by 5 `update` operations of type `BasicModel`",
+                      logs.output[0])
+
+    def test_query_accounting_per_bulk_flush(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(5)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/bulk/debug-queries",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        content = json.loads(response.content)
+        self.assertEqual(5, len(content[ATOMIC_RESULTS]))
+        bulk = content["meta"]["queries"]["bulk"]
+        self.assertEqual(1, len(bulk))
+        self.assertEqual(("add", "BasicModel", 5),
+                         (bulk[0]["op"], bulk[0]["type"], bulk[0]["size"]))
+
+    def test_results_are_serialized_with_constant_queries(self):
+        related = RelatedModelTwo.objects.create(text="JSON API paints my bikeshed!")
+
+        def post(size):
+            operations = [
+                {
+                    "op": "add",
+                    "data": {
+                        "type": "BasicModel",
+                        "attributes": {
+                            "text": "JSON API paints my bikeshed!"
+                        },
+                        "relationships": {
+                            "to_many": {
+                                "data": [{"type": "RelatedModelTwo", "id": str(related.pk)}]
+                            }
+                        }
+                    }
+                } for _ in range(size)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    path="/",
+                    data={ATOMIC_OPERATIONS: operations},
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+                )
+            self.assertEqual(200, response.status_code)
+            results = json.loads(response.content)[ATOMIC_RESULTS]
+            self.assertTrue(all(
+                result["data"]["relationships"]["to_many"]["data"] == [{"type": "RelatedModelTwo", "id": str(related.pk)}]
+                for result in results
+            ))
+            return [query["sql"] for query in queries.captured_queries if '"tests_relatedmodeltwo"."text"' in query["sql"]]
+
+        # the related resources of all results are loaded by one query
+        self.assertEqual(len(post(2)), len(post(6)))
+
+    def test_results_reflect_the_state_of_their_operation(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "lid": "1",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "lid": "1",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "remove",
+                "ref": {
+                    "lid": "1",
+                    "type": "BasicModel"
+                }
+            }
+        ]
+
+        response = self.client.post(
+            path="/",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [
+                ("BasicModel", "JSON API paints my bikeshed!"),
+                ("BasicModel", "JSON API paints my bikeshed2!"),
+                ("RelatedModel", "JSON API paints my bikeshed!"),
+            ],
+            [(result["data"]["type"], result["data"]["attributes"]["text"])
+             for result in json.loads(response.content)[ATOMIC_RESULTS]]
+        )
+
+    def test_results_reflect_the_state_of_their_operation_in_bulk_mode(self):
+        obj = BasicModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "update",
+                "data": {
+                    "id": str(obj.pk),
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": text
+                    }
+                }
+            } for text in ["one", "two"]
+        ]
+
+        for path in ["/bulk", "/bulk/blind-update"]:
+            response = self.client.post(
+                path=path,
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(
+                ["one", "two"],
+                [result["data"]["attributes"]["text"] for result in json.loads(response.content)[ATOMIC_RESULTS]]
+            )
+
+    def test_profile_of_staff_request(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(3)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        self.client.force_login(User.objects.create(username="staff", is_staff=True))
+        with tempfile.TemporaryDirectory() as profile_directory:
+            with mock.patch.object(ProfilingAtomicOperationView, "profile_directory", profile_directory):
+                response = self.client.post(
+                    path="/profile",
+                    data=data,
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, "HTTP_X_ATOMIC_PROFILE": "1", "HTTP_X_REQUEST_ID": "slow-batch"}
+                )
+
+            self.assertEqual(200, response.status_code)
+            self.assertEqual("slow-batch-3ops.prof", response["X-Atomic-Profile"])
+            self.assertEqual(["slow-batch-3ops.prof"], os.listdir(profile_directory))
+            stats = pstats.Stats(os.path.join(profile_directory, "slow-batch-3ops.prof"))
+            self.assertIn("render", {function for _, _, function in stats.stats})
+
+    def test_profile_is_not_written_for_other_users(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        self.client.force_login(User.objects.create(username="user"))
+        with tempfile.TemporaryDirectory() as profile_directory:
+            with mock.patch.object(ProfilingAtomicOperationView, "profile_directory", profile_directory):
+                response = self.client.post(
+                    path="/profile",
+                    data=data,
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, "HTTP_X_ATOMIC_PROFILE": "1"}
+                )
+
+            self.assertEqual(200, response.status_code)
+            self.assertFalse(response.has_header("X-Atomic-Profile"))
+            self.assertEqual([], os.listdir(profile_directory))
+
+    def test_tracing_spans_per_operation(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "remove",
+                "ref": {
+                    "id": "1",
+                    "type": "BasicModel"
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        TracingAtomicOperationView.tracer.clear()
+        response = self.client.post(
+            path="/tracing",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        add_span, remove_span, request_span = TracingAtomicOperationView.tracer.spans
+        self.assertEqual("atomic_operations", request_span.name)
+        self.assertEqual({"atomic.operations": 2}, request_span.attributes)
+        self.assertEqual("handle_sequential", add_span.name)
+        self.assertEqual(
+            {"atomic.op": "add", "atomic.type": "BasicModel", "atomic.index": 0, "atomic.rows": 1}, add_span.attributes)
+        self.assertEqual(
+            {"atomic.op": "remove", "atomic.type": "BasicModel", "atomic.index": 1, "atomic.rows": 1}, remove_span.attributes)
+        self.assertIs(request_span, add_span.parent)
+        self.assertIs(request_span, remove_span.parent)
+
+    def test_tracing_spans_per_bulk_flush(self):
+        BasicModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(3)
+        ] + [
+            {
+                "op": "remove",
+                "ref": {
+                    "id": "1",
+                    "type": "BasicModel"
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        BulkTracingAtomicOperationView.tracer.clear()
+        response = self.client.post(
+            path="/bulk/tracing",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [
+                ("perform_bulk_create", {"atomic.op": "add", "atomic.type": "BasicModel", "atomic.rows": 3}),
+                ("perform_bulk_delete", {"atomic.op": "remove", "atomic.type": "BasicModel", "atomic.rows": 1}),
+                ("atomic_operations", {"atomic.operations": 4}),
+            ],
+            [(span.name, span.attributes) for span in BulkTracingAtomicOperationView.tracer.spans]
+        )
+
+    def test_memory_profile_by_phase(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(4)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        with self.assertLogs("atomic_operations.memory", level="INFO") as logs:
+            response = self.client.post(
+                path="/memory",
+                data=data,
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            ["parse", "execute", "render"],
+            [re.search(r"phase=(\w+)", message).group(1) for message in logs.output]
+        )
+        self.assertTrue(all("operations=4 " in message for message in logs.output))
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_memory_profile_of_streamed_results(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for _ in range(3)
+        ]
+
+        with mock.patch.object(StreamingAtomicOperationView, "profile_memory", True), \
+                self.assertLogs("atomic_operations.memory", level="INFO") as logs:
+            response = self.client.post(
+                path="/stream",
+                data={ATOMIC_OPERATIONS: operations},
+                content_type=ATOMIC_CONTENT_TYPE,
+
+                **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+            )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(json.loads(b"".join(response.streaming_content))[ATOMIC_RESULTS]))
+        # the results are rendered while the response is sent
+        self.assertEqual(
+            ["parse", "execute"],
+            [re.search(r"phase=(\w+)", message).group(1) for message in logs.output]
+        )
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_memory_profilers_share_tracing(self):
+        first, second = MemoryProfiler(), MemoryProfiler()
+
+        with first.measure("execute"):
+            with second.measure("execute"):
+                pass
+            first.stop()
+        # the second profiler still traces after the first one is finished
+        self.assertTrue(tracemalloc.is_tracing())
+        with second.measure("render"):
+            pass
+        second.stop()
+
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(["execute", "render"], [usage.phase for usage in second.usages])
+
+    def test_memory_profile_without_peak(self):
+        profiler = MemoryProfiler()
+        with mock.patch("atomic_operations.memory.CAN_RESET_PEAK", False):
+            with profiler.measure("execute"):
+                pass
+        profiler.stop()
+
+        self.assertEqual(
+            (None, None), (profiler.usages[0].peak, profiler.get_summary(1)["phases"][0]["peak_per_operation"]))
+
+    def test_streaming_results(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": f"JSON API paints my bikeshed {idx}!"
+                    }
+                }
+            } for idx in range(3)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/stream",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertEqual(ATOMIC_CONTENT_TYPE, response["Content-Type"])
+        chunks = list(response.streaming_content)
+        # opening, two chunks of results and closing
+        self.assertEqual(4, len(chunks))
+        self.assertEqual(
+            {
+                ATOMIC_RESULTS: [
+                    {
+                        "data": {
+                            "id": str(idx + 1),
+                            "type": "BasicModel",
+                            "attributes": {
+                                "text": f"JSON API paints my bikeshed {idx}!"
+                            },
+                            "relationships": {
+                                "to_many": {"data": [], "meta": {"count": 0}},
+                                "to_one": {"data": None}
+                            }
+                        }
+                    } for idx in range(3)
+                ]
+            },
+            json.loads(b"".join(chunks))
+        )
+
+    def test_streaming_without_results(self):
+        BasicModel.objects.create(text="JSON API paints my bikeshed!")
+        operations = [
+            {
+                "op": "remove",
+                "ref": {
+                    "id": "1",
+                    "type": "BasicModel"
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/stream",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(204, response.status_code)
+        self.assertFalse(response.streaming)
+
+    def get_include_operations(self, size, related, related_two):
+        return [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": f"JSON API paints my bikeshed {idx}!"
+                    },
+                    "relationships": {
+                        "to_one": {
+                            "data": {"type": "RelatedModel", "id": str(related.pk)}
+                        },
+                        "to_many": {
+                            "data": [{"type": "RelatedModelTwo", "id": str(obj.pk)} for obj in related_two]
+                        }
+                    }
+                }
+            } for idx in range(size)
+        ]
+
+    def test_included_resources(self):
+        related = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        related_two = [RelatedModelTwo.objects.create(text=f"JSON API paints my bikeshed {idx}!") for idx in range(2)]
+        operations = self.get_include_operations(2, related, related_two) + [
+            {
+                "op": "update",
+                "data": {
+                    "id": str(related_two[0].pk),
+                    "type": "RelatedModelTwo",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed 2!"
+                    }
+                }
+            }
+        ]
+
+        response = self.client.post(
+            path="/include?include=to_one,to_many",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        document = json.loads(response.content)
+        self.assertEqual(3, len(document[ATOMIC_RESULTS]))
+        # every resource is included once and resources which are results themselves are not included
+        self.assertEqual(
+            [
+                {
+                    "id": str(related.pk),
+                    "type": "RelatedModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }, {
+                    "id": str(related_two[1].pk),
+                    "type": "RelatedModelTwo",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed 1!"
+                    }
+                }
+            ],
+            document["included"]
+        )
+
+    def test_included_resources_are_loaded_per_path(self):
+        related = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        related_two = [RelatedModelTwo.objects.create(text=f"JSON API paints my bikeshed {idx}!") for idx in range(2)]
+
+        def post(size):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    path="/include?include=to_one,to_many",
+                    data={ATOMIC_OPERATIONS: self.get_include_operations(size, related, related_two)},
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+                )
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(3, len(json.loads(response.content)["included"]))
+            return [
+                query["sql"] for query in queries.captured_queries
+                if query["sql"].startswith("SELECT") and (
+                    '"tests_relatedmodel"."text"' in query["sql"] or '"tests_relatedmodeltwo"."text"' in query["sql"])
+            ]
+
+        self.assertEqual(len(post(2)), len(post(6)))
+
+    def test_unsupported_include_path(self):
+        response = self.client.post(
+            path="/include?include=unknown",
+            data={ATOMIC_OPERATIONS: self.get_include_operations(
+                1, RelatedModel.objects.create(text="JSON API"), [RelatedModelTwo.objects.create(text="JSON API")])},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(
+            "This endpoint does not support the include parameter for path unknown",
+            json.loads(response.content)["errors"][0]["detail"]
+        )
+        self.assertFalse(BasicModel.objects.exists())
+
+    def test_streaming_included_resources(self):
+        related = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        related_two = RelatedModelTwo.objects.create(text="JSON API paints my bikeshed!")
+
+        response = self.client.post(
+            path="/stream/include?include=to_one",
+            data={ATOMIC_OPERATIONS: self.get_include_operations(3, related, [related_two])},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        document = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(3, len(document[ATOMIC_RESULTS]))
+        self.assertEqual(
+            [{"id": str(related.pk), "type": "RelatedModel", "attributes": {"text": "JSON API paints my bikeshed!"}}],
+            document["included"]
+        )
+
+    def test_document_is_executed_as_job(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+        ]
+
+        response = self.client.post(
+            path="/jobs",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, "HTTP_PREFER": "respond-async"}
+        )
+
+        self.assertEqual(202, response.status_code)
+        job = json.loads(response.content)["data"]
+        self.assertEqual("AtomicJob", job["type"])
+        self.assertEqual(f"http://testserver/jobs/{job['id']}", response["Location"])
+
+        response = self.client.get(response["Location"], **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            "JSON API paints my bikeshed!",
+            json.loads(response.content)[ATOMIC_RESULTS][0]["data"]["attributes"]["text"]
+        )
+        self.assertEqual(1, BasicModel.objects.count())
+
+    def test_job_is_not_stored_without_url(self):
+        store = InMemoryJobStore()
+        operations = [{"op": "add", "data": {"type": "BasicModel", "attributes": {"text": "JSON API paints my bikeshed!"}}}]
+
+        with mock.patch.object(JobAtomicOperationView, "job_url_name", None), \
+                mock.patch.object(JobAtomicOperationView, "job_store", store):
+            with self.assertRaises(ImproperlyConfigured):
+                self.client.post(
+                    path="/jobs",
+                    data={ATOMIC_OPERATIONS: operations},
+                    content_type=ATOMIC_CONTENT_TYPE,
+
+                    **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, "HTTP_PREFER": "respond-async"}
+                )
+
+        self.assertEqual({}, dict(store.jobs))
+
+    def test_in_memory_job_store_evicts_jobs(self):
+        store = InMemoryJobStore(timeout=60, max_jobs=2)
+        jobs = [Job([]) for _ in range(4)]
+        for job in jobs[:3]:
+            job.finish(200, b"")
+            store.save(job)
+        # unfinished jobs are kept even if the store is full
+        store.save(jobs[3])
+
+        self.assertEqual([None, None, jobs[2], jobs[3]], [store.get(job.id) for job in jobs])
+
+        with mock.patch("atomic_operations.jobs.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(store.get(jobs[3].id))
+            store.save(Job([]))
+        self.assertEqual(1, len(store.jobs))
+
+    def test_failed_job(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!" * 10
+                    }
+                }
+            }
+        ]
+
+        response = self.client.post(
+            path="/jobs",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, "HTTP_PREFER": "respond-async"}
+        )
+        self.assertEqual(202, response.status_code)
+
+        response = self.client.get(response["Location"], **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE})
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(
+            f"/{ATOMIC_OPERATIONS}/1/data/attributes/text",
+            json.loads(response.content)["errors"][0]["source"]["pointer"]
+        )
+        self.assertEqual(0, BasicModel.objects.count())
+
+    def test_job_is_only_visible_to_its_user(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+        ]
+        self.client.force_login(User.objects.create_user(username="job-user"))
+
+        response = self.client.post(
+            path="/jobs",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, "HTTP_PREFER": "respond-async"}
+        )
+        self.assertEqual(202, response.status_code)
+
+        self.client.force_login(User.objects.create_user(username="other-user"))
+        response = self.client.get(response["Location"], **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE})
+
+        self.assertEqual(404, response.status_code)
+
+    def test_document_is_executed_synchronously_without_preference(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+        ]
+
+        response = self.client.post(
+            path="/jobs",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(json.loads(response.content)[ATOMIC_RESULTS]))
+
+    def test_bulk_view_processing_with_updates_and_removes(self):
+        for _ in range(4):
+            BasicModel.objects.create(text="JSON API paints my bikeshed!")
+
+        operations = [
+            {
+                "op": "update",
+                "data": {
+                    "id": f"{pk}",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            } for pk in [1, 2]
+        ] + [
+            {
+                "op": "remove",
+                "ref": {
+                    "id": f"{pk}",
+                    "type": "BasicModel",
+                }
+            } for pk in [3, 4]
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/bulk",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, len(json.loads(response.content)[ATOMIC_RESULTS]))
+        self.assertListEqual(
+            [(1, "JSON API paints my bikeshed2!"),
+             (2, "JSON API paints my bikeshed2!")],
+            list(BasicModel.objects.values_list("pk", "text"))
+        )
+
+    def test_bulk_view_processing_with_lid_relationship(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModel",
+                    "lid": f"bulk-lid-{idx}",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            } for idx in range(2)
+        ] + [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    },
+                    "relationships": {
+                        "to_one": {
+                            "data": {"type": "RelatedModel", "lid": f"bulk-lid-{idx}"}
+                        }
+                    }
+                }
+            } for idx in range(2)
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/bulk",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertListEqual(
+            [1, 2], list(BasicModel.objects.values_list("to_one__pk", flat=True)))
+
+    def test_lids_are_not_shared_between_requests(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "lid": "1",
+                    "type": "RelatedModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+        ]
+
+        data = {
+            ATOMIC_OPERATIONS: operations
+        }
+
+        response = self.client.post(
+            path="/",
+            data=data,
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({}, ConcretAtomicOperationView.lid_to_id)
+
+
+class TestMultiDatabaseAtomicOperationView(TestCase):
+    databases = {"default", "other"}
+
+    def test_router_is_required(self):
+        with override_settings(DATABASE_ROUTERS=[]):
+            with self.assertRaises(ImproperlyConfigured):
+                MultiDatabaseAtomicOperationView.as_view()
+            # views without database aliases do not need the router
+            ConcretAtomicOperationView.as_view()
+        MultiDatabaseAtomicOperationView.as_view()
+
+    def post(self, path, operations):
+        return self.client.post(
+            path=path,
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+    def test_operations_are_routed_by_resource_type(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModelTwo",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": "1",
+                    "type": "RelatedModelTwo",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }
+        ]
+
+        response = self.post("/multi-db", operations)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, RelatedModel.objects.using("default").count())
+        self.assertEqual(0, RelatedModel.objects.using("other").count())
+        self.assertEqual(0, RelatedModelTwo.objects.using("default").count())
+        self.assertEqual("JSON API paints my bikeshed2!",
+                         RelatedModelTwo.objects.using("other").get(pk=1).text)
+
+    def test_bulk_operations_are_routed_by_resource_type(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModelTwo",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModelTwo",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }
+        ]
+
+        response = self.post("/bulk/multi-db", operations)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(0, RelatedModelTwo.objects.using("default").count())
+        self.assertEqual(2, RelatedModelTwo.objects.using("other").count())
+
+    def test_all_databases_are_rolled_back(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModelTwo",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "add",
+                "data": {
+                    "type": "RelatedModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed!"
+                    }
+                }
+            }, {
+                "op": "update",
+                "data": {
+                    "id": "1",
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": "JSON API paints my bikeshed2!"
+                    }
+                }
+            }
+        ]
+
+        response = self.post("/multi-db", operations)
+
+        self.assertEqual(422, response.status_code)
+        self.assertEqual(0, RelatedModel.objects.using("default").count())
+        self.assertEqual(0, RelatedModelTwo.objects.using("other").count())
+
+
+class TestParallelValidation(TransactionTestCase):
+    """The worker threads use their own connections, so they can only read committed rows"""
+
+    def post(self, path, operations):
+        return Client().post(
+            path=path,
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+    def get_operation(self, resource_type, attributes, pk=None):
+        operation = {
+            "op": "update" if pk else "add",
+            "data": {
+                "type": resource_type,
+                "attributes": attributes
+            }
+        }
+        if pk:
+            operation["data"]["id"] = str(pk)
+        return operation
+
+    def test_unique_fields_are_validated_in_order(self):
+        obj = UniqueModel.objects.create(code="x", text="JSON API paints my bikeshed!")
+        independent_operation = self.get_operation("BasicModel", {"text": "JSON API paints my bikeshed!"})
+
+        # the add reuses the code which is released by the earlier update
+        response = self.post("/parallel-validation", [
+            independent_operation,
+            self.get_operation("UniqueModel", {"code": "y"}, pk=obj.pk),
+            self.get_operation("UniqueModel", {"code": "x", "text": "JSON API paints my bikeshed!"}),
+        ])
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(["x", "y"], sorted(UniqueModel.objects.values_list("code", flat=True)))
+
+        response = self.post("/parallel-validation", [
+            independent_operation,
+            self.get_operation("UniqueModel", {"code": "z", "text": "JSON API paints my bikeshed!"}),
+            self.get_operation("UniqueModel", {"code": "z", "text": "JSON API paints my bikeshed!"}),
+        ])
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(
+            f"/{ATOMIC_OPERATIONS}/2/data/attributes/code",
+            json.loads(response.content)["errors"][0]["source"]["pointer"]
+        )
+        self.assertFalse(UniqueModel.objects.filter(code="z").exists())
+
+    def test_operations_after_cascading_remove_are_validated_in_order(self):
+        related = RelatedModel.objects.create(text="JSON API paints my bikeshed!")
+        obj = BasicModel.objects.create(text="JSON API paints my bikeshed!", to_one=related)
+
+        response = self.post("/parallel-validation", [
+            self.get_operation("RelatedModelTwo", {"text": "JSON API paints my bikeshed!"}),
+            self.get_operation("RelatedModelTwo", {"text": "JSON API paints my bikeshed!"}),
+            {"op": "remove", "ref": {"id": str(related.pk), "type": "RelatedModel"}},
+            self.get_operation("BasicModel", {"text": "JSON API paints my bikeshed2!"}, pk=obj.pk),
+        ])
+
+        self.assertEqual(422, response.status_code)
+        error = json.loads(response.content)["errors"][0]
+        self.assertEqual(
+            ("object-does-not-exist", f"/{ATOMIC_OPERATIONS}/3/data/id"), (error["id"], error["source"]["pointer"]))
+        self.assertEqual(1, BasicModel.objects.count())
+
+    def test_queries_of_the_workers_are_recorded(self):
+        operations = [
+            self.get_operation("BasicModel", {"text": "green"}, pk=BasicModel.objects.create(text="red").pk)
+            for _ in range(3)
+        ]
+
+        counts = []
+        for path, view in [("/prevalidate", PrevalidatingAtomicOperationView),
+                           ("/parallel-validation", ParallelValidatingAtomicOperationView)]:
+            with mock.patch.object(view, "debug_queries", True):
+                response = self.post(path, operations)
+            self.assertEqual(200, response.status_code, path)
+            counts.append(json.loads(response.content)["meta"]["queries"]["total"]["count"])
+
+        # the instances of the updates are loaded by the worker threads
+        self.assertEqual(counts[0], counts[1])
+
+
+class TestThreadJobExecutor(TransactionTestCase):
+
+    def test_job_is_executed_by_a_worker_thread(self):
+        operations = [
+            {
+                "op": "add",
+                "data": {
+                    "type": "BasicModel",
+                    "attributes": {
+                        "text": f"JSON API paints my bikeshed {idx}!"
+                    }
+                }
+            } for idx in range(3)
+        ]
+        client = Client()
+
+        response = client.post(
+            path="/jobs/thread",
+            data={ATOMIC_OPERATIONS: operations},
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE, "HTTP_PREFER": "respond-async"}
+        )
+        self.assertEqual(202, response.status_code)
+
+        ThreadJobAtomicOperationView.job_executor.shutdown(wait=True)
+        response = client.get(response["Location"], **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(json.loads(response.content)[ATOMIC_RESULTS]))
+        self.assertEqual(3, BasicModel.objects.count())
+
+
+class TestGroupCommit(TransactionTestCase):
+
+    def post(self, *texts: str):
+        return Client().post(
+            path="/group-commit",
+            data={
+                ATOMIC_OPERATIONS: [
+                    {
+                        "op": "add",
+                        "data": {
+                            "type": "BasicModel",
+                            "attributes": {
+                                "text": text
+                            }
+                        }
+                    } for text in texts
+                ]
+            },
+            content_type=ATOMIC_CONTENT_TYPE,
+
+            **{"HTTP_ACCEPT": ATOMIC_CONTENT_TYPE}
+        )
+
+    def test_group_fails_if_connections_can_not_be_checked(self):
+        executor = GroupCommitExecutor()
+        future = Future()
+        error = OperationalError("connection lost")
+
+        with mock.patch("atomic_operations.group_commit.close_old_connections", side_effect=error), \
+                self.assertLogs("atomic_operations.group_commit", "ERROR"):
+            executor.commit_group([(copy_context(), BasicModel.objects.create, (), future)])
+
+        # the request receives the error instead of waiting forever
+        self.assertIs(error, future.exception(timeout=0))
+        self.assertFalse(BasicModel.objects.exists())
+
+    def test_concurrent_requests_share_one_transaction(self):
+        texts = [f"JSON API paints my bikeshed {idx}!" for idx in range(3)] + ["JSON API paints my bikeshed!" * 10]
+        responses = {}
+        barrier = threading.Barrier(len(texts))
+
+        def post(text):
+            barrier.wait()
+            if text == texts[3]:
+                # the failing request writes a row before its second operation fails
+                responses[text] = self.post("JSON API paints my bikeshed, then fails!", text)
+            else:
+                responses[text] = self.post(text)
+
+        with self.assertLogs("atomic_operations.group_commit", "DEBUG") as logs:
+            threads = [threading.Thread(target=post, args=(text,)) for text in texts]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertIn("committed 4 requests in one transaction", logs.output[0])
+        # every request receives its own response and the failing one only rolls back its own savepoint
+        for text in texts[:3]:
+            self.assertEqual(200, responses[text].status_code)
+            self.assertEqual(text, json.loads(responses[text].content)[ATOMIC_RESULTS][0]["data"]["attributes"]["text"])
+        self.assertEqual(400, responses[texts[3]].status_code)
+        self.assertEqual(
+            f"/{ATOMIC_OPERATIONS}/1/data/attributes/text",
+            json.loads(responses[texts[3]].content)["errors"][0]["source"]["pointer"]
+        )
+        self.assertEqual(set(texts[:3]), set(BasicModel.objects.values_list("text", flat=True)))
@@ -1,10 +1,71 @@
 from django.urls import path
 
-from tests.views import BulkAtomicOperationView, ConcretAtomicOperationView
+from atomic_operations.views import AtomicJobView
+from tests.views import (
+    AdmissionControlledAtomicOperationView,
+    BlindUpdateAtomicOperationView,
+    BulkAtomicOperationView,
+    BulkBlindUpdateAtomicOperationView,
+    BulkDryRunAtomicOperationView,
+    BulkFastRemoveAtomicOperationView,
+    BulkMultiDatabaseAtomicOperationView,
+    BulkQueryDebugAtomicOperationView,
+    BulkTracingAtomicOperationView,
+    BulkUpsertAtomicOperationView,
+    ConcretAtomicOperationView,
+    DetectFastRemoveAtomicOperationView,
+    DryRunAtomicOperationView,
+    FastRemoveAtomicOperationView,
+    GroupCommitAtomicOperationView,
+    IncludeAtomicOperationView,
+    JobAtomicOperationView,
+    MemoryProfilingAtomicOperationView,
+    MultiDatabaseAtomicOperationView,
+    ParallelValidatingAtomicOperationView,
+    PermissionAtomicOperationView,
+    PrevalidatingAtomicOperationView,
+    ProfilingAtomicOperationView,
+    QueryDebugAtomicOperationView,
+    StreamingAtomicOperationView,
+    StreamingIncludeAtomicOperationView,
+    ThreadJobAtomicOperationView,
+    TimingAtomicOperationView,
+    TracingAtomicOperationView,
+    UpsertAtomicOperationView,
+)
 
 
 urlpatterns = [
     path("", ConcretAtomicOperationView.as_view()),
-    path("bulk", BulkAtomicOperationView.as_view())
+    path("bulk", BulkAtomicOperationView.as_view()),
+    path("prevalidate", PrevalidatingAtomicOperationView.as_view()),
+    path("parallel-validation", ParallelValidatingAtomicOperationView.as_view()),
+    path("admission", AdmissionControlledAtomicOperationView.as_view()),
+    path("dry-run", DryRunAtomicOperationView.as_view()),
+    path("fast-remove", FastRemoveAtomicOperationView.as_view()),
+    path("bulk/fast-remove", BulkFastRemoveAtomicOperationView.as_view()),
+    path("bulk/detect-fast-remove", DetectFastRemoveAtomicOperationView.as_view()),
+    path("blind-update", BlindUpdateAtomicOperationView.as_view()),
+    path("bulk/blind-update", BulkBlindUpdateAtomicOperationView.as_view()),
+    path("upsert", UpsertAtomicOperationView.as_view()),
+    path("bulk/upsert", BulkUpsertAtomicOperationView.as_view()),
+    path("bulk/dry-run", BulkDryRunAtomicOperationView.as_view()),
+    path("multi-db", MultiDatabaseAtomicOperationView.as_view()),
+    path("bulk/multi-db", BulkMultiDatabaseAtomicOperationView.as_view()),
+    path("permissions", PermissionAtomicOperationView.as_view()),
+    path("timing", TimingAtomicOperationView.as_view()),
+    path("debug-queries", QueryDebugAtomicOperationView.as_view()),
+    path("bulk/debug-queries", BulkQueryDebugAtomicOperationView.as_view()),
+    path("profile", ProfilingAtomicOperationView.as_view()),
+    path("tracing", TracingAtomicOperationView.as_view()),
+    path("bulk/tracing", BulkTracingAtomicOperationView.as_view()),
+    path("memory", MemoryProfilingAtomicOperationView.as_view()),
+    path("stream", StreamingAtomicOperationView.as_view()),
+    path("include", IncludeAtomicOperationView.as_view()),
+    path("stream/include", StreamingIncludeAtomicOperationView.as_view()),
+    path("group-commit", GroupCommitAtomicOperationView.as_view()),
+    path("jobs", JobAtomicOperationView.as_view()),
+    path("jobs/thread", ThreadJobAtomicOperationView.as_view()),
+    path("jobs/<str:pk>", AtomicJobView.as_view(), name="atomic-job"),
 
 ]
@@ -1,8 +1,19 @@
+import os
+import tempfile
+
+from atomic_operations.admission import AdmissionController
+from atomic_operations.group_commit import GroupCommitExecutor
+from atomic_operations.jobs import SynchronousJobExecutor, ThreadJobExecutor
+from atomic_operations.timing import LoggingTimingSink
+from atomic_operations.tracing import InMemoryTracer
 from atomic_operations.views import AtomicOperationView
+from tests.permissions import ReadOnlyTextPermission
 from tests.serializers import (
     BasicModelSerializer,
+    IncludingBasicModelSerializer,
     RelatedModelSerializer,
     RelatedModelTwoSerializer,
+    UniqueModelSerializer,
 )
 
 
@@ -13,10 +24,138 @@ class ConcretAtomicOperationView(AtomicOperationView):
         "remove:BasicModel": BasicModelSerializer,
         "add:RelatedModel": RelatedModelSerializer,
         "update:RelatedModel": RelatedModelSerializer,
+        "remove:RelatedModel": RelatedModelSerializer,
         "add:RelatedModelTwo": RelatedModelTwoSerializer,
+        "update:RelatedModelTwo": RelatedModelTwoSerializer,
+        "add:UniqueModel": UniqueModelSerializer,
+        "update:UniqueModel": UniqueModelSerializer,
 
     }
 
 
 class BulkAtomicOperationView(ConcretAtomicOperationView):
     sequential = False
+
+
+class PrevalidatingAtomicOperationView(ConcretAtomicOperationView):
+    validate_before_transaction = True
+
+
+class ParallelValidatingAtomicOperationView(ConcretAtomicOperationView):
+    validation_workers = 4
+
+
+class AdmissionControlledAtomicOperationView(ConcretAtomicOperationView):
+    admission_controller = AdmissionController(max_cost=4, retry_after=5)
+
+
+class DryRunAtomicOperationView(ConcretAtomicOperationView):
+    allow_dry_run = True
+
+
+class BulkDryRunAtomicOperationView(DryRunAtomicOperationView):
+    sequential = False
+
+
+class UpsertAtomicOperationView(ConcretAtomicOperationView):
+    upsert_fields = {"UniqueModel": ["code"]}
+
+
+class BulkUpsertAtomicOperationView(UpsertAtomicOperationView):
+    sequential = False
+
+
+class FastRemoveAtomicOperationView(ConcretAtomicOperationView):
+    fast_remove_types = ["BasicModel"]
+
+
+class BulkFastRemoveAtomicOperationView(FastRemoveAtomicOperationView):
+    sequential = False
+
+
+class BlindUpdateAtomicOperationView(ConcretAtomicOperationView):
+    blind_update_types = ["BasicModel", "UniqueModel"]
+
+
+class BulkBlindUpdateAtomicOperationView(BlindUpdateAtomicOperationView):
+    sequential = False
+
+
+class DetectFastRemoveAtomicOperationView(ConcretAtomicOperationView):
+    sequential = False
+    detect_fast_removes = True
+    fast_remove_chunk_size = 2
+
+
+class MultiDatabaseAtomicOperationView(ConcretAtomicOperationView):
+    database_aliases = {
+        "RelatedModelTwo": "other"
+    }
+
+
+class BulkMultiDatabaseAtomicOperationView(MultiDatabaseAtomicOperationView):
+    sequential = False
+
+
+class PermissionAtomicOperationView(ConcretAtomicOperationView):
+    permission_classes = [ReadOnlyTextPermission]
+
+
+class TimingAtomicOperationView(ConcretAtomicOperationView):
+    server_timing = True
+    timing_sink = LoggingTimingSink()
+
+
+class QueryDebugAtomicOperationView(ConcretAtomicOperationView):
+    debug_queries = True
+
+
+class BulkQueryDebugAtomicOperationView(QueryDebugAtomicOperationView):
+    sequential = False
+
+
+class ProfilingAtomicOperationView(ConcretAtomicOperationView):
+    profile_directory = os.path.join(tempfile.gettempdir(), "atomic-operations-profiles")
+
+
+class TracingAtomicOperationView(ConcretAtomicOperationView):
+    tracer = InMemoryTracer()
+
+
+class BulkTracingAtomicOperationView(TracingAtomicOperationView):
+    sequential = False
+
+
+class MemoryProfilingAtomicOperationView(ConcretAtomicOperationView):
+    profile_memory = True
+
+
+class StreamingAtomicOperationView(ConcretAtomicOperationView):
+    stream_results = True
+    stream_chunk_size = 2
+
+
+class IncludeAtomicOperationView(ConcretAtomicOperationView):
+    serializer_classes = {
+        **ConcretAtomicOperationView.serializer_classes,
+        "add:BasicModel": IncludingBasicModelSerializer,
+        "update:BasicModel": IncludingBasicModelSerializer,
+    }
+
+
+class StreamingIncludeAtomicOperationView(IncludeAtomicOperationView):
+    stream_results = True
+    stream_chunk_size = 2
+
+
+class JobAtomicOperationView(ConcretAtomicOperationView):
+    job_executor = SynchronousJobExecutor()
+    job_url_name = "atomic-job"
+
+
+class ThreadJobAtomicOperationView(JobAtomicOperationView):
+    job_executor = ThreadJobExecutor()
+
+
+class GroupCommitAtomicOperationView(ConcretAtomicOperationView):
+    group_commit = GroupCommitExecutor(window=0.2)